@@ -0,0 +1,456 @@
+# =========================
+# 🗄️ Almacenes de datos para las apps de asistencia
+# Las apps trabajan contra la interfaz de gspread.Worksheet (HojaAlmacen). Además
+# de Google Sheets hay dos implementaciones locales con la misma interfaz:
+#   - "sqlite": la hoja persistida en un archivo SQLite (sin red ni cuota).
+#   - "falso":  una hoja en memoria que imita la API de Sheets, con latencia
+#               configurable y errores de cuota (429) o de servidor (5xx).
+# Se elige con [almacen] backend = "sheets" | "sqlite" | "falso" en
+# .streamlit/secrets.toml o con la variable ASISTENCIA_BACKEND.
+# =========================
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import deque, namedtuple
+from pathlib import Path
+from typing import List, Optional, Protocol
+
+import gspread
+import requests
+from gspread.utils import a1_range_to_grid_range
+
+BACKENDS = ("sheets", "sqlite", "falso")
+Pestana = namedtuple("Pestana", "title id")
+_LECTURAS = {"get_all_values", "get", "batch_get", "row_values"}
+
+
+class HojaAlmacen(Protocol):
+    """Subconjunto de gspread.Worksheet que usan las apps de asistencia."""
+    id: int
+    title: str
+    row_count: int
+    col_count: int
+    spreadsheet: object
+
+    def get_all_values(self) -> List[list]: ...
+    def get(self, rango: str) -> List[list]: ...
+    def batch_get(self, rangos: List[str]) -> List[List[list]]: ...
+    def row_values(self, fila: int) -> list: ...
+    def update(self, rango: str, valores: List[list], value_input_option=None): ...
+    def batch_update(self, datos: List[dict], value_input_option=None): ...
+    def append_rows(self, filas: List[list], value_input_option=None): ...
+    def delete_columns(self, inicio: int, fin: Optional[int] = None): ...
+    def clear(self): ...
+    def freeze(self, rows=None, cols=None): ...
+
+
+def _error_api(codigo: int, mensaje: str) -> gspread.exceptions.APIError:
+    """APIError como el que devuelve gspread, para que los reintentos lo traten igual."""
+    resp = requests.Response()
+    resp.status_code = codigo
+    estado = "RESOURCE_EXHAUSTED" if codigo == 429 else "UNAVAILABLE"
+    resp._content = json.dumps({"error": {"code": codigo, "message": mensaje, "status": estado}}).encode()
+    return gspread.exceptions.APIError(resp)
+
+
+def _celda(v, value_input_option) -> str:
+    # Con USER_ENTERED, Sheets quita el apóstrofo que fuerza texto (p. ej. teléfonos)
+    v = "" if v is None else str(v)
+    if value_input_option == "USER_ENTERED" and v.startswith("'"):
+        return v[1:]
+    return v
+
+
+def _id_pestana(titulo: str) -> int:
+    # sheetId estable por título, para que los requests apunten a la pestaña correcta
+    return zlib.crc32(titulo.encode("utf-8")) & 0x7FFFFFFF
+
+
+def _slug(texto: str) -> str:
+    return re.sub(r"\W+", "_", texto)
+
+
+def _recortar(fila: list) -> list:
+    # La API omite las celdas vacías al final de cada fila
+    fin = len(fila)
+    while fin and fila[fin - 1] == "":
+        fin -= 1
+    return list(fila[:fin])
+
+
+class LibroLocal:
+    """Spreadsheet mínimo: el batch_update de borrados/vaciado y la lista de pestañas."""
+    REQUESTS = ("deleteDimension", "updateCells", "deleteSheet", "updateSheetProperties")
+
+    def __init__(self, hoja: "_HojaBase"):
+        self._hoja = hoja
+        self.id = hoja.sheet_id
+        self.title = hoja.sheet_id
+
+    def worksheets(self) -> List[Pestana]:
+        return self._hoja._pestanas()
+
+    def batch_update(self, body: dict):
+        h = self._hoja
+        pedidos = body.get("requests", [])
+        # Como en Sheets, un request inválido rechaza el lote entero antes de aplicar nada
+        for req in pedidos:
+            tipo = next(iter(req), None)
+            if tipo not in self.REQUESTS:
+                raise ValueError(f"request de batch_update no soportado por el almacén local: {tipo!r}")
+            if tipo == "deleteDimension" and req[tipo]["range"].get("dimension") != "ROWS":
+                raise ValueError("deleteDimension: el almacén local solo borra filas (dimension ROWS)")
+        h._antes("spreadsheet.batch_update")
+        with h._lock:
+            for req in pedidos:
+                if "deleteDimension" in req:
+                    rng = req["deleteDimension"]["range"]
+                    h._borrar(rng["startIndex"] + 1, rng["endIndex"])
+                    h.row_count -= rng["endIndex"] - rng["startIndex"]
+                elif "updateCells" in req:
+                    h._truncar(req["updateCells"]["range"].get("startRowIndex", 0) + 1)
+                elif "deleteSheet" in req:
+                    h._eliminar_pestana(req["deleteSheet"]["sheetId"])
+                elif "updateSheetProperties" in req:
+                    filas = req["updateSheetProperties"]["properties"]["gridProperties"]["rowCount"]
+                    h._truncar(filas + 1)
+                    h.row_count = filas
+        return {"spreadsheetId": h.sheet_id, "replies": [{} for _ in pedidos]}
+
+
+class _HojaBase(ABC):
+    """Semántica de Worksheet sobre primitivas de filas (1-based, inclusivas)."""
+    def __init__(self, sheet_id: str, sheet_name: str, filas_grilla: int = 2000, columnas: int = 26):
+        self.sheet_id = sheet_id
+        self.title = sheet_name
+        self.id = _id_pestana(sheet_name)
+        self.row_count = filas_grilla
+        self.col_count = columnas
+        self.spreadsheet = LibroLocal(self)
+        self._lock = threading.RLock()
+
+    # --- primitivas ---
+    @abstractmethod
+    def _leer(self, ini: int, fin: Optional[int]) -> List[list]: ...
+    @abstractmethod
+    def _escribir(self, cambios: dict): ...  # {fila: (col0, valores)}
+    @abstractmethod
+    def _anexar(self, filas: List[list]): ...
+    @abstractmethod
+    def _borrar(self, ini: int, fin: int): ...
+    @abstractmethod
+    def _truncar(self, desde: int): ...
+    @abstractmethod
+    def _largo(self) -> int: ...
+    @abstractmethod
+    def _eliminar_pestana(self, sheet_id_num: int): ...
+
+    def _antes(self, endpoint: str):
+        """Gancho por llamada (latencia/errores en la hoja falsa); corre fuera del lock."""
+
+    def _pestanas(self) -> List[Pestana]:
+        return [Pestana(self.title, self.id)]
+
+    # --- interfaz de Worksheet ---
+    def _rango(self, rango: str) -> List[list]:
+        g = a1_range_to_grid_range(rango)
+        ini = g.get("startRowIndex", 0) + 1
+        fin = g.get("endRowIndex")
+        c0, c1 = g.get("startColumnIndex", 0), g.get("endColumnIndex")
+        filas = [_recortar(f[c0:c1]) for f in self._leer(ini, fin)]
+        while filas and not filas[-1]:
+            filas.pop()
+        return filas
+
+    def get_all_values(self) -> List[list]:
+        self._antes("get_all_values")
+        with self._lock:
+            return self._rango("A1:ZZZ")
+
+    def get(self, rango: str) -> List[list]:
+        self._antes("get")
+        with self._lock:
+            return self._rango(rango)
+
+    def batch_get(self, rangos: List[str]) -> List[List[list]]:
+        self._antes("batch_get")
+        with self._lock:
+            return [self._rango(r) for r in rangos]
+
+    def row_values(self, fila: int) -> list:
+        self._antes("row_values")
+        with self._lock:
+            filas = self._rango(f"A{fila}:ZZZ{fila}")
+            return filas[0] if filas else []
+
+    def _cambios(self, datos: List[dict], value_input_option) -> dict:
+        cambios = {}
+        for d in datos:
+            g = a1_range_to_grid_range(d["range"])
+            ini, c0 = g.get("startRowIndex", 0) + 1, g.get("startColumnIndex", 0)
+            for k, vals in enumerate(d["values"]):
+                cambios[ini + k] = (c0, [_celda(v, value_input_option) for v in vals])
+        return cambios
+
+    def update(self, rango: str, valores: List[list], value_input_option=None):
+        self._antes("update")
+        with self._lock:
+            self._escribir(self._cambios([{"range": rango, "values": valores}], value_input_option))
+
+    def batch_update(self, datos: List[dict], value_input_option=None):
+        self._antes("batch_update")
+        with self._lock:
+            self._escribir(self._cambios(datos, value_input_option))
+
+    def append_rows(self, filas: List[list], value_input_option=None):
+        self._antes("append_rows")
+        with self._lock:
+            self._anexar([[_celda(v, value_input_option) for v in f] for f in filas])
+            self.row_count = max(self.row_count, self._largo())
+
+    def delete_columns(self, inicio: int, fin: Optional[int] = None):
+        self._antes("delete_columns")
+        with self._lock:
+            fin = fin or inicio
+            filas = self._leer(1, None)
+            self._truncar(1)
+            self._anexar([f[:inicio - 1] + f[fin:] for f in filas])
+
+    def clear(self):
+        self._antes("clear")
+        with self._lock:
+            self._truncar(1)
+
+    def freeze(self, rows=None, cols=None):
+        self._antes("freeze")
+
+
+class HojaMemoria(_HojaBase):
+    """Hoja en memoria del proceso."""
+    def __init__(self, sheet_id: str, sheet_name: str, **kwargs):
+        super().__init__(sheet_id, sheet_name, **kwargs)
+        self._valores: List[list] = []
+
+    def _leer(self, ini, fin):
+        return [list(f) for f in self._valores[ini - 1:fin]]
+
+    def _escribir(self, cambios):
+        for fila, (c0, vals) in cambios.items():
+            while len(self._valores) < fila:
+                self._valores.append([])
+            actual = self._valores[fila - 1]
+            actual += [""] * (c0 + len(vals) - len(actual))
+            actual[c0:c0 + len(vals)] = vals
+
+    def _anexar(self, filas):
+        self._valores.extend(list(f) for f in filas)
+
+    def _borrar(self, ini, fin):
+        del self._valores[ini - 1:fin]
+
+    def _truncar(self, desde):
+        del self._valores[desde - 1:]
+
+    def _largo(self):
+        return len(self._valores)
+
+    def _pestanas(self):
+        with _HOJAS_FALSAS_LOCK:
+            return ([Pestana(n, _id_pestana(n)) for (sid, n) in _HOJAS_FALSAS if sid == self.sheet_id]
+                    or [Pestana(self.title, self.id)])
+
+    def _eliminar_pestana(self, sheet_id_num):
+        with _HOJAS_FALSAS_LOCK:
+            for clave in [k for k in _HOJAS_FALSAS if k[0] == self.sheet_id and _id_pestana(k[1]) == sheet_id_num]:
+                del _HOJAS_FALSAS[clave]
+
+
+class HojaFalsa(HojaMemoria):
+    """Imita la API de Sheets: latencia por llamada, cuota por minuto y fallos al azar.
+
+    latencia:   segundos medios por llamada (±50 % de variación).
+    cuota_min:  llamadas de lectura (y aparte de escritura) permitidas en una
+                ventana de 60 s, como la cuota por usuario de Sheets; la
+                siguiente recibe 429.
+    prob_error: probabilidad de que una llamada falle con 503.
+    """
+    def __init__(self, sheet_id: str, sheet_name: str, latencia: float = 0.0,
+                 cuota_min: int = 0, prob_error: float = 0.0, **kwargs):
+        super().__init__(sheet_id, sheet_name, **kwargs)
+        self.latencia = float(latencia)
+        self.cuota_min = int(cuota_min)
+        self.prob_error = float(prob_error)
+        self._ventanas = {"lectura": deque(), "escritura": deque()}
+        self._lock_cuota = threading.Lock()
+        self.llamadas = {}
+        self.errores = {"429": 0, "503": 0}
+
+    def _antes(self, endpoint: str):
+        self.llamadas[endpoint] = self.llamadas.get(endpoint, 0) + 1
+        if self.cuota_min:
+            tipo = "lectura" if endpoint in _LECTURAS else "escritura"
+            ventana = self._ventanas[tipo]
+            with self._lock_cuota:
+                ahora = time.monotonic()
+                while ventana and ahora - ventana[0] > 60:
+                    ventana.popleft()
+                if len(ventana) >= self.cuota_min:
+                    self.errores["429"] += 1
+                    raise _error_api(429, f"Quota exceeded for '{tipo} requests per minute per user' (simulado)")
+                ventana.append(ahora)
+        if self.latencia:
+            time.sleep(self.latencia * random.uniform(0.5, 1.5))
+        if self.prob_error and random.random() < self.prob_error:
+            self.errores["503"] += 1
+            raise _error_api(503, "The service is currently unavailable (simulado)")
+
+
+class HojaSQLite(_HojaBase):
+    """Hoja persistida en SQLite: una fila de la tabla por fila de la hoja (JSON)."""
+    def __init__(self, sheet_id: str, sheet_name: str, path: Path, **kwargs):
+        super().__init__(sheet_id, sheet_name, **kwargs)
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS filas(pos INTEGER PRIMARY KEY, valores TEXT NOT NULL);")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta(clave TEXT PRIMARY KEY, valor TEXT);")
+        self._conn.executemany("INSERT OR REPLACE INTO meta(clave, valor) VALUES (?, ?)",
+                               [("sheet_id", sheet_id), ("title", sheet_name)])
+        self.row_count = max(self.row_count, self._largo())
+
+    def _tx(self, sentencias: list):
+        """Ejecuta [(sql, params)] en una sola transacción; params lista → executemany."""
+        with self._conn:
+            self._conn.execute("BEGIN")
+            for sql, params in sentencias:
+                if isinstance(params, list):
+                    self._conn.executemany(sql, params)
+                else:
+                    self._conn.execute(sql, params)
+
+    def _leer(self, ini, fin):
+        cur = self._conn.execute(
+            "SELECT valores FROM filas WHERE pos >= ? AND pos <= ? ORDER BY pos",
+            (ini, fin if fin is not None else 2 ** 62)
+        )
+        return [json.loads(v) for (v,) in cur]
+
+    def _escribir(self, cambios):
+        largo = self._largo()
+        actuales = {}
+        for fila in cambios:
+            if fila <= largo:
+                actuales[fila] = (self._leer(fila, fila) or [[]])[0]
+        nuevas = []
+        for fila, (c0, vals) in sorted(cambios.items()):
+            actual = actuales.get(fila, [])
+            actual += [""] * (c0 + len(vals) - len(actual))
+            actual[c0:c0 + len(vals)] = vals
+            nuevas.append((fila, json.dumps(actual, ensure_ascii=False)))
+        huecos = [(p, "[]") for p in range(largo + 1, max(cambios, default=0)) if p not in cambios]
+        self._tx([("INSERT OR REPLACE INTO filas(pos, valores) VALUES (?, ?)", huecos + nuevas)])
+
+    def _anexar(self, filas):
+        largo = self._largo()
+        self._tx([("INSERT INTO filas(pos, valores) VALUES (?, ?)",
+                   [(largo + i, json.dumps(list(f), ensure_ascii=False)) for i, f in enumerate(filas, start=1)])])
+
+    def _borrar(self, ini, fin):
+        # pos es el rowid: el UPDATE recorre en orden ascendente, sin choques de clave
+        self._tx([("DELETE FROM filas WHERE pos >= ? AND pos <= ?", (ini, fin)),
+                  ("UPDATE filas SET pos = pos - ? WHERE pos > ?", (fin - ini + 1, fin))])
+
+    def _truncar(self, desde):
+        self._tx([("DELETE FROM filas WHERE pos >= ?", (desde,))])
+
+    def _largo(self):
+        return self._conn.execute("SELECT COALESCE(MAX(pos), 0) FROM filas").fetchone()[0]
+
+    def _archivos_del_libro(self):
+        # Cada pestaña es un archivo; el título real se guarda en su tabla meta
+        for ruta in sorted(self.path.parent.glob(f"almacen_{_slug(self.sheet_id)}_*.db")):
+            try:
+                conn = sqlite3.connect(ruta, timeout=5)
+                try:
+                    meta = dict(conn.execute("SELECT clave, valor FROM meta").fetchall())
+                finally:
+                    conn.close()
+            except sqlite3.Error:
+                continue
+            if meta.get("sheet_id") == self.sheet_id:
+                yield ruta, meta.get("title", "")
+
+    def _pestanas(self):
+        return [Pestana(t, _id_pestana(t)) for _, t in self._archivos_del_libro()]
+
+    def _eliminar_pestana(self, sheet_id_num):
+        for ruta, titulo in list(self._archivos_del_libro()):
+            if _id_pestana(titulo) == sheet_id_num:
+                for extra in ("", "-wal", "-shm"):
+                    Path(str(ruta) + extra).unlink(missing_ok=True)
+
+
+_HOJAS_FALSAS = {}
+_HOJAS_FALSAS_LOCK = threading.Lock()
+
+
+def filas_sinteticas(header: List[str], n: int, semilla: int = 0) -> List[list]:
+    """Registros de prueba con valores plausibles según el nombre de cada columna."""
+    rnd = random.Random(semilla)
+    delegs = ["Carmen", "Pavas", "Hatillo", "Naranjo", "Grecia", "Liberia", "Alajuela Sur", "Cartago"]
+    generadores = {
+        "id_registro": lambda i: f"00000000-0000-4000-8000-{i:012d}",
+        "nombre": lambda i: f"Persona {i}",
+        "cedula": lambda i: str(rnd.randint(100000000, 799999999)),
+        "delegacion": lambda i: rnd.choice(delegs),
+        "cargo": lambda i: "Oficial",
+        "telefono": lambda i: f"8{rnd.randint(1000000, 9999999)}",
+        "genero": lambda i: rnd.choice(["F", "M", "LGBTIQ+"]),
+        "sexo": lambda i: rnd.choice(["H", "M", "I"]),
+        "edad": lambda i: rnd.choice(["18 a 35 años", "36 a 64 años", "65 años o más"]),
+        "fecha": lambda i: "01/01/2025",
+        "fecha_servidor": lambda i: "01/01/2025",
+        "hora_servidor": lambda i: "08:00:00",
+        "timestamp_servidor": lambda i: "2025-01-01 08:00:00",
+    }
+    return [[generadores.get(h, lambda i: "")(i) for h in header] for i in range(1, n + 1)]
+
+
+def abrir_hoja(backend: str, sheet_id: str, sheet_name: str, header: List[str],
+               carpeta: Path, **opciones) -> HojaAlmacen:
+    """Abre (o crea con encabezado) la hoja local indicada.
+
+    Opciones: latencia, cuota_min y prob_error para "falso"; filas_iniciales
+    para sembrar registros sintéticos en una hoja vacía.
+    """
+    if backend not in BACKENDS or backend == "sheets":
+        raise ValueError(f"backend local desconocido: {backend!r} (use 'sqlite' o 'falso')")
+    filas_iniciales = int(opciones.pop("filas_iniciales", 0))
+
+    if backend == "falso":
+        with _HOJAS_FALSAS_LOCK:
+            hoja = _HOJAS_FALSAS.get((sheet_id, sheet_name))
+            if hoja is None:
+                hoja = HojaFalsa(sheet_id, sheet_name, columnas=len(header), **opciones)
+                _HOJAS_FALSAS[(sheet_id, sheet_name)] = hoja
+    else:
+        ruta = Path(carpeta) / f"almacen_{_slug(sheet_id)}_{_slug(sheet_name)}.db"
+        hoja = HojaSQLite(sheet_id, sheet_name, ruta, columnas=len(header))
+
+    # Encabezado y semilla sin pasar por el gancho de latencia/cuota; los datos
+    # existentes se conservan aunque el encabezado haya cambiado.
+    with hoja._lock:
+        primera = hoja._leer(1, 1)
+        if not primera or _recortar(primera[0]) != list(header):
+            hoja._escribir({1: (0, list(header))})
+        if filas_iniciales and hoja._largo() <= 1:
+            hoja._anexar(filas_sinteticas(header, filas_iniciales))
+        hoja.row_count = max(hoja.row_count, hoja._largo())
+    return hoja
@@ -184,6 +184,7 @@ with tab_excel:
             from openpyxl import Workbook
             from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
             from openpyxl.drawing.image import Image as XLImage
+            from openpyxl.worksheet.pagebreak import Break
             from pathlib import Path
         except Exception:
             st.error("Falta 'openpyxl' en requirements.txt")
@@ -279,26 +280,40 @@ with tab_excel:
                 ws[f"S{r}"].value = "Virtual"
                 for c in range(2, 20): ws.cell(row=r, column=c).border = border_all
 
-        # construir archivo
-        df = fetch_all_df(include_id=False)
-        datos = df.drop(columns=["Nº"]) if not df.empty else df
-        if st.button("📥 Generar y descargar Excel oficial", use_container_width=True, type="primary"):
-            try:
-                from openpyxl import Workbook  # verificación rápida
-            except Exception:
-                st.error("Agrega 'openpyxl' a requirements.txt")
-            else:
-                xls_bytes = build_excel_official_from_scratch(
-                    fecha_evento, lugar, hora_inicio, hora_fin, estrategia, delegacion, datos
-                )
-                if xls_bytes:
-                    st.download_button(
-                        "⬇️ Descargar Excel (estructura replicada)",
-                        data=xls_bytes,
-                        file_name=f"Lista_Asistencia_Oficial_{date.today():%Y%m%d}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        use_container_width=True
-                    )
+        def _paginar(ws, n_filas: int, start_row: int = 11):
+            # El encabezado (filas 1 a start_row-1) se dibuja una sola vez: Excel lo repite
+            # al imprimir en cada página y aquí solo se marca un salto cada per_page asistentes.
+            paso = max(1, int(per_page))
+            ws.print_title_rows = f"1:{start_row - 1}"
+            ws.print_area = f"A1:S{start_row + max(n_filas, 1) - 1}"
+            ws.page_setup.orientation = "landscape"; ws.page_setup.paperSize = ws.PAPERSIZE_LETTER
+            ws.page_setup.fitToWidth = 1; ws.page_setup.fitToHeight = 0
+            ws.sheet_properties.pageSetUpPr.fitToPage = True
+            ws.oddFooter.center.text = "Página &P de &N"
+            for r in range(start_row + paso - 1, start_row + n_filas - 1, paso):
+                ws.row_breaks.append(Break(id=r))
+
+        _setup_sheet(ws0)
+        _fill_rows(ws0, rows_df)
+        _paginar(ws0, len(rows_df))
+        bio = BytesIO(); wb.save(bio); return bio.getvalue()
+
+    # construir archivo
+    df = fetch_all_df(include_id=False)
+    datos = df.drop(columns=["Nº"]) if not df.empty else df
+    if st.button("📥 Generar y descargar Excel oficial", use_container_width=True, type="primary"):
+        # Sin openpyxl el constructor ya avisa con st.error y devuelve b""
+        xls_bytes = build_excel_official_from_scratch(
+            fecha_evento, lugar, hora_inicio, hora_fin, estrategia, delegacion, datos
+        )
+        if xls_bytes:
+            st.download_button(
+                "⬇️ Descargar Excel (estructura replicada)",
+                data=xls_bytes,
+                file_name=f"Lista_Asistencia_Oficial_{date.today():%Y%m%d}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True
+            )
 
 
 
@@ -0,0 +1,198 @@
+# =========================
+# 🗺️ Supervisión regional – Asistencia consolidada de todas las hojas
+# =========================
+import streamlit as st
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+import re
+import time as _time
+
+st.set_page_config(page_title="Supervisión – Asistencia consolidada", layout="wide")
+
+# ---------- Backend de datos: Google Sheets ----------
+import gspread
+
+# ⚠️ HOJAS DE CADA APP DE ASISTENCIA (una entrada por SHEET_ID distinto).
+# app-Esteban.py y app-Angel.py escriben en la misma hoja, por eso van juntas.
+TENANTS = {
+    "Esteban / Angel": ("1vzGRJrlUzaCdhJAQBa6i94RE2QxnKqFvXpch9HF4TO8", "Hoja 1"),
+    "Sargento":        ("17V2K13eZcxBObS3yvMwPf_DRaj0QlaNo--KSwbb3KeI", "Hoja 1"),
+    "Jenny":           ("1QLPzX7tklXHNIUyQvqv6lq0aiJn3LF-kR0aHlUK47W4", "Hoja 1"),
+    "Luis":            ("1eiZKW4czjhahDrWer31-QMPYoTN9lsozsG-xp8yIwK0", "Hoja 1"),
+    "Pame":            ("1fftX923jBlMh5p2xzLsTwiACHp3VClfl27VxObjmmdc", "Hoja 1"),
+    "Jannia":          ("1Xkj3lIoOT83VSBuQfN8eJkv2lT4EZEiG3jWhGri7LZU", "Hoja 1"),
+    "Copia":           ("1lhREae4X-RcbeMmjSpT3CRJZo5enizyHmZxazzDGI-4", "Hoja 1"),
+}
+
+TENANT_TTL = 120   # segundos que se reutiliza la lectura de cada hoja
+MAX_HILOS = 8      # lecturas simultáneas (una por hoja)
+
+# Las columnas se ubican por nombre de encabezado: las hojas de 8 columnas y la
+# de app-Angel.py (id_registro + marcas de tiempo) se leen igual.
+NAME_MAP = {
+    "nombre":"Nombre",
+    "cedula":"Cédula de Identidad",
+    "delegacion":"Delegación",
+    "cargo":"Cargo",
+    "telefono":"Teléfono",
+    "genero":"Género",
+    "sexo":"Sexo",
+    "edad":"Rango de Edad",
+}
+COLS_ORDER = ["Tenant","Nombre","Cédula de Identidad","Delegación","Cargo","Teléfono","Género","Sexo","Rango de Edad"]
+CAT_COLS = ["Tenant","Género","Sexo","Rango de Edad","Delegación"]
+
+def _sa_key():
+    try:
+        sa = st.secrets["gcp_service_account"]
+        return sa.get("client_email","") + "|" + sa.get("project_id","")
+    except Exception:
+        return ""
+
+@st.cache_resource(show_spinner=False)
+def _get_gc(sa_key: str):
+    if "gcp_service_account" not in st.secrets:
+        raise RuntimeError("Falta el bloque [gcp_service_account] en .streamlit/secrets.toml")
+    return gspread.service_account_from_dict(st.secrets["gcp_service_account"])
+
+def _values_to_df(tenant: str, values: List[list]) -> pd.DataFrame:
+    if not values:
+        return pd.DataFrame(columns=COLS_ORDER)
+    header = [h.strip().lower() for h in values[0]]
+    pos = {NAME_MAP[k]: j for j, k in enumerate(header) if k in NAME_MAP}
+    ancho = len(header)
+    filas = [r + [""] * (ancho - len(r)) for r in values[1:] if any(c.strip() for c in r)]
+    columnas = list(zip(*filas))
+    vacia = [""] * len(filas)
+    data = {"Tenant": [tenant] * len(filas)}
+    for col in COLS_ORDER[1:]:
+        j = pos.get(col)
+        data[col] = columnas[j] if j is not None and columnas else vacia
+    return pd.DataFrame(data, columns=COLS_ORDER, dtype=object)
+
+@st.cache_data(ttl=TENANT_TTL, show_spinner=False)
+def leer_tenant(tenant: str, sheet_id: str, sheet_name: str, sa_key: str) -> dict:
+    """Lee la pestaña base y sus particiones por mes ("Hoja 1 2025-10").
+
+    Dos llamadas por libro: los títulos de las pestañas y un values.batchGet
+    con todas las que correspondan.
+    """
+    t0 = _time.perf_counter()
+    gc = _get_gc(sa_key)
+    meta = gc.http_client.fetch_sheet_metadata(sheet_id, params={"fields": "sheets.properties.title"})
+    patron = re.compile(re.escape(sheet_name) + r"( \d{4}-\d{2})?")
+    titulos = [h["properties"]["title"] for h in meta.get("sheets", [])]
+    titulos = [t for t in titulos if patron.fullmatch(t)]
+    rangos = ["'" + t.replace("'", "''") + "'" for t in titulos]
+    res = gc.http_client.values_batch_get(sheet_id, rangos).get("valueRanges", []) if rangos else []
+    frames = [_values_to_df(tenant, r.get("values", [])) for r in res]
+    return {
+        "df": pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLS_ORDER),
+        "segundos": _time.perf_counter() - t0,
+        "leido": pd.Timestamp.now(),
+    }
+
+def leer_todos(tenants: Dict[str, tuple]):
+    """Lee todas las hojas en paralelo; el tiempo total es el de la más lenta.
+
+    Devuelve (frame consolidado, estado por tenant, segundos de pared).
+    """
+    sa_key = _sa_key()
+    _get_gc(sa_key)  # las credenciales se crean una vez, fuera de los hilos
+    t0 = _time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(MAX_HILOS, len(tenants)) or 1) as pool:
+        futuros = {
+            nombre: pool.submit(leer_tenant, nombre, sid, hoja, sa_key)
+            for nombre, (sid, hoja) in tenants.items()
+        }
+    pared = _time.perf_counter() - t0
+
+    frames, estado = [], []
+    for nombre, fut in futuros.items():
+        try:
+            res = fut.result()
+        except Exception as e:
+            estado.append({"Tenant": nombre, "Registros": 0, "Lectura (s)": None,
+                           "Leído": None, "Error": str(e)[:200]})
+            continue
+        frames.append(res["df"])
+        estado.append({"Tenant": nombre, "Registros": len(res["df"]),
+                       "Lectura (s)": round(res["segundos"], 2),
+                       "Leído": res["leido"], "Error": ""})
+
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLS_ORDER)
+    df["Delegación"] = df["Delegación"].replace("", "(sin delegación)")
+    df = df.astype({c: "category" for c in CAT_COLS})
+    return df, pd.DataFrame(estado), pared
+
+# ---------- Acceso ----------
+if "is_admin" not in st.session_state:
+    st.session_state.is_admin = False
+
+with st.sidebar:
+    st.markdown("### 🔐 Acceso supervisión")
+    if not st.session_state.is_admin:
+        pwd = st.text_input("Contraseña", type="password", placeholder="••••••••")
+        if st.button("Ingresar"):
+            if pwd == "Sembremos23":
+                st.session_state.is_admin = True
+                st.success("Acceso concedido.")
+                st.rerun()
+            else:
+                st.error("Contraseña incorrecta.")
+    else:
+        st.success("Sesión de supervisión activa")
+        if st.button("Cerrar sesión"):
+            st.session_state.is_admin = False
+            st.rerun()
+
+st.markdown("# 🗺️ Supervisión – Asistencia consolidada")
+
+if not st.session_state.is_admin:
+    st.info("Ingresa la contraseña en la barra lateral para ver el consolidado.")
+    st.stop()
+
+sel_tenants = st.multiselect("Hojas a incluir", list(TENANTS), default=list(TENANTS))
+if st.button("🔄 Actualizar todas las hojas"):
+    leer_tenant.clear()
+    st.rerun()
+
+if not sel_tenants:
+    st.warning("Selecciona al menos una hoja.")
+    st.stop()
+
+with st.spinner("Leyendo hojas…"):
+    df, estado, pared = leer_todos({k: TENANTS[k] for k in sel_tenants})
+
+suma = estado["Lectura (s)"].fillna(0).sum()
+st.caption(f"Lectura en paralelo: {pared:.2f} s de pared (la suma secuencial sería {suma:.2f} s). "
+           f"Cada hoja se reutiliza durante {TENANT_TTL} s.")
+fallidas = estado[estado["Error"] != ""]
+if not fallidas.empty:
+    st.warning("No se pudieron leer: " + ", ".join(fallidas["Tenant"]))
+
+m1, m2, m3 = st.columns(3)
+m1.metric("Registros", len(df))
+m2.metric("Hojas leídas", len(estado) - len(fallidas))
+m3.metric("Delegaciones", df["Delegación"].nunique())
+
+st.markdown("### 📊 Totales por hoja")
+st.dataframe(estado, use_container_width=True, hide_index=True)
+
+st.markdown("### 🏢 Totales por delegación")
+if df.empty:
+    st.info("No hay registros en las hojas seleccionadas.")
+else:
+    por_deleg = pd.crosstab(df["Delegación"], df["Tenant"], margins=True, margins_name="Total")
+    por_deleg = por_deleg.sort_values("Total", ascending=False)
+    st.dataframe(por_deleg, use_container_width=True)
+
+with st.expander("📋 Registros consolidados"):
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    st.download_button(
+        "⬇️ Descargar CSV consolidado",
+        data=df.to_csv(index=False).encode("utf-8-sig"),
+        file_name="asistencia_consolidada.csv",
+        mime="text/csv",
+    )
@@ -4,13 +4,35 @@
 import streamlit as st
 import pandas as pd
 from io import BytesIO
-from datetime import date, time, datetime
+from datetime import date, time, datetime, timedelta, timezone
 from typing import List
+from pathlib import Path
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time as _time
+import types
+import zipfile
 
 st.set_page_config(page_title="Asistencia – Registro y Admin", layout="wide")
 
 # ---------- Backend de datos: Google Sheets ----------
 import gspread
+import requests
+import urllib3
+from google.auth.transport.requests import Request as _PedidoToken
+import almacen_hojas
+import lista_oficial
 try:
     from zoneinfo import ZoneInfo  # Python 3.9+
 except Exception:
@@ -20,8 +42,19 @@ except Exception:
 SHEET_ID = "17V2K13eZcxBObS3yvMwPf_DRaj0QlaNo--KSwbb3KeI"
 SHEET_NAME = "Hoja 1"
 
-# Estructura final (8 columnas)
-HEADER = ["nombre","cedula","delegacion","cargo","telefono","genero","sexo","edad"]
+# Estructura final (9 columnas; fecha = día del envío en hora de Costa Rica)
+HEADER = ["nombre","cedula","delegacion","cargo","telefono","genero","sexo","edad","fecha"]
+ULTIMA_COL = chr(ord("A") + len(HEADER) - 1)  # "I"; los rangos de la hoja salen de aquí
+
+# Cambio de esquema: la columna "fecha" (I) se agregó al final para que la clave
+# de duplicados sea (cédula, delegación, fecha). Migración de las pestañas con
+# el encabezado anterior de 8 columnas (A:H), al abrir cada una:
+#   - _abrir_y_validar agrega la columna a la cuadrícula y reescribe A1:I1;
+#     el archivo en otra planilla se migra igual en _get_archivo_cached;
+#   - las filas existentes quedan con fecha vacía y no chocan con envíos nuevos;
+#   - las réplicas locales suman la columna con ALTER TABLE (init_replica).
+# Como la columna va al final, las filas viejas no se mueven; app-Supervision.py
+# lee por nombre de columna y no cambia.
 
 # Catálogo de delegaciones (incluye la opción solicitada)
 DELEGACIONES = [
@@ -45,6 +78,297 @@ DELEGACIONES = [
     "Upala","Los Chiles - Cutris - Pocosol","Sarapiquí","Colorado","Pococí","Guacimo",
 ]
 
+# ---------- Límite de cuota y reintentos ----------
+# Todas las llamadas a gspread pasan por un cliente compartido por el proceso:
+# un token bucket por tipo (lectura/escritura) ajustado a la cuota por minuto
+# de la API de Sheets, reintentos con backoff exponencial con jitter ante 429,
+# 5xx y errores de red, y un circuit breaker que deja de insistir durante un
+# rato tras varios fallos seguidos (mientras tanto la cola local retiene los
+# envíos y las lecturas salen de la réplica).
+CUOTA_LECTURAS_MIN = 60     # solicitudes de lectura por minuto por usuario
+CUOTA_ESCRITURAS_MIN = 60   # solicitudes de escritura por minuto por usuario
+REINTENTOS_MAX = 5
+BACKOFF_BASE = 1.0          # segundos
+BACKOFF_MAX = 32.0
+BREAKER_FALLOS = 5          # fallos reintentables seguidos que abren el circuito
+BREAKER_ENFRIAMIENTO = 60   # segundos con el circuito abierto
+MUESTRAS_LATENCIA = 500     # últimas llamadas por endpoint para p50/p95
+
+LECTURAS = {"get_all_values", "get", "row_values", "batch_get", "open_by_key",
+            "worksheet", "worksheets", "fetch_sheet_metadata"}
+# Agregar filas no es idempotente: se reintenta solo si el pedido no se aplicó
+NO_IDEMPOTENTES = {"append_row", "append_rows"}
+
+class CircuitoAbierto(RuntimeError):
+    pass
+
+class _TokenBucket:
+    def __init__(self, por_minuto: int):
+        self.capacidad = float(por_minuto)
+        self.tasa = por_minuto / 60.0
+        self.tokens = self.capacidad
+        self.t = _time.monotonic()
+        self._lock = threading.Lock()
+
+    def tomar(self) -> float:
+        """Reserva un token; duerme lo necesario y devuelve cuánto esperó."""
+        with self._lock:
+            ahora = _time.monotonic()
+            self.tokens = min(self.capacidad, self.tokens + (ahora - self.t) * self.tasa)
+            self.t = ahora
+            self.tokens -= 1
+            espera = max(0.0, -self.tokens / self.tasa)
+        if espera:
+            _time.sleep(espera)
+        return espera
+
+def _es_reintentable(e: Exception) -> bool:
+    if isinstance(e, gspread.exceptions.APIError):
+        return e.code == 429 or e.code >= 500
+    return isinstance(e, OSError)  # errores de conexión/timeout de requests
+
+def _sin_efecto(e: Exception) -> bool:
+    """True si el pedido seguro no se aplicó en la hoja (rechazado o nunca enviado)."""
+    if isinstance(e, gspread.exceptions.APIError):
+        return e.code < 500
+    # Un 5xx o un timeout de lectura pueden llegar después de que Google guardó las filas
+    return isinstance(e, (CircuitoAbierto, requests.exceptions.ConnectTimeout))
+
+class _ClienteSheets:
+    def __init__(self):
+        self.buckets = {
+            "lectura": _TokenBucket(CUOTA_LECTURAS_MIN),
+            "escritura": _TokenBucket(CUOTA_ESCRITURAS_MIN),
+        }
+        self._lock = threading.Lock()
+        self.stats = {}
+        self.tiempos = {}  # endpoint → últimas (duración, fases HTTP)
+        self._fallos = 0
+        self._abierto_hasta = 0.0
+
+    def _contar(self, endpoint: str, campo: str):
+        with self._lock:
+            fila = self.stats.setdefault(endpoint, {"llamadas": 0, "limitadas": 0, "reintentos": 0, "errores": 0})
+            fila[campo] += 1
+
+    def circuito_abierto(self) -> bool:
+        return _time.monotonic() < self._abierto_hasta
+
+    def llamar(self, endpoint: str, tipo: str, fn, *args, **kwargs):
+        if self.circuito_abierto():
+            self._contar(endpoint, "errores")
+            raise CircuitoAbierto("Google Sheets no responde; se reintentará en unos segundos.")
+        self._contar(endpoint, "llamadas")
+        for intento in range(REINTENTOS_MAX + 1):
+            if self.buckets[tipo].tomar() > 0:
+                self._contar(endpoint, "limitadas")
+            try:
+                _MEDICION.fases = dict.fromkeys(FASES_HTTP, 0.0)
+                t0 = _time.perf_counter()
+                res = fn(*args, **kwargs)
+            except Exception as e:
+                if not _es_reintentable(e):
+                    self._contar(endpoint, "errores")
+                    raise
+                if intento == REINTENTOS_MAX or (endpoint in NO_IDEMPOTENTES and not _sin_efecto(e)):
+                    self._contar(endpoint, "errores")
+                    with self._lock:
+                        self._fallos += 1
+                        if self._fallos >= BREAKER_FALLOS:
+                            self._abierto_hasta = _time.monotonic() + BREAKER_ENFRIAMIENTO
+                    raise
+                self._contar(endpoint, "reintentos")
+                _time.sleep(min(BACKOFF_MAX, BACKOFF_BASE * 2 ** intento) * random.uniform(0.5, 1.0))
+                continue
+            duracion = _time.perf_counter() - t0
+            with self._lock:
+                self._fallos = 0
+                self.tiempos.setdefault(endpoint, deque(maxlen=MUESTRAS_LATENCIA)).append((duracion, _MEDICION.fases))
+            return res
+
+    def resumen(self) -> pd.DataFrame:
+        """Contadores por endpoint y latencias de las últimas llamadas (ms; fases en mediana)."""
+        columnas_fases = [f"{f} ms" for f in FASES_HTTP]
+        with self._lock:
+            filas = []
+            for k, v in sorted(self.stats.items()):
+                fila = {"Endpoint": k, **v}
+                muestras = list(self.tiempos.get(k, ()))
+                if muestras:
+                    duraciones = [d for d, _ in muestras]
+                    fila["p50 ms"] = _percentil(duraciones, 0.50) * 1000
+                    fila["p95 ms"] = _percentil(duraciones, 0.95) * 1000
+                    for fase, col in zip(FASES_HTTP, columnas_fases):
+                        fila[col] = _percentil([f[fase] for _, f in muestras], 0.50) * 1000
+                filas.append(fila)
+        return pd.DataFrame(
+            filas,
+            columns=["Endpoint", "llamadas", "limitadas", "reintentos", "errores", "p50 ms", "p95 ms"] + columnas_fases
+        ).round(1)
+
+class _ProxyLimitado:
+    """Envuelve un Worksheet/Spreadsheet de gspread: cada método pasa por el cliente."""
+    def __init__(self, obj, cliente: _ClienteSheets):
+        self._obj = obj
+        self._cliente = cliente
+        self._prefijo = "spreadsheet." if isinstance(obj, (gspread.Spreadsheet, almacen_hojas.LibroLocal)) else ""
+
+    def __getattr__(self, name):
+        attr = getattr(self._obj, name)
+        if isinstance(attr, (gspread.Spreadsheet, gspread.Worksheet, almacen_hojas.LibroLocal)):
+            return _ProxyLimitado(attr, self._cliente)
+        if not callable(attr):
+            return attr
+        tipo = "lectura" if name in LECTURAS else "escritura"
+        def llamada(*args, **kwargs):
+            return self._cliente.llamar(self._prefijo + name, tipo, attr, *args, **kwargs)
+        return llamada
+
+@st.cache_resource(show_spinner=False)
+def _get_cliente() -> _ClienteSheets:
+    return _ClienteSheets()
+
+def _percentil(valores: list, q: float) -> float:
+    orden = sorted(valores)
+    return orden[min(len(orden) - 1, int(q * len(orden)))]
+
+# ---------- Sesión HTTP ----------
+# Un solo cliente gspread por proceso: todas las pestañas y el archivo comparten
+# una sesión con pool de conexiones keep-alive y respuestas comprimidas (Google
+# solo manda gzip si el User-Agent dice "gzip"). El token se renueva en un hilo
+# de fondo antes de vencer, así ninguna llamada paga el refresco. Cada respuesta
+# anota sus fases: conexión (DNS+TCP, 0 si se reutilizó), TLS, espera hasta los
+# encabezados y transferencia del cuerpo.
+HTTP_POOL = 10            # conexiones keep-alive por host
+HTTP_TIMEOUT = (5, 60)    # segundos: conectar, leer
+TOKEN_MARGEN = 300        # segundos antes del vencimiento en que se renueva
+FASES_HTTP = ["conexión", "TLS", "espera", "transferencia"]
+
+_MEDICION = threading.local()  # fases de la llamada en curso en este hilo
+
+def _anotar_fases(**fases):
+    actual = getattr(_MEDICION, "fases", None)
+    if actual is not None:
+        for fase, seg in fases.items():
+            actual[fase] += seg
+
+class _ConexionMedida(urllib3.connection.HTTPSConnection):
+    def _new_conn(self):
+        t0 = _time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            self._t_tcp = _time.perf_counter() - t0
+
+    def connect(self):
+        self._t_tcp = 0.0
+        t0 = _time.perf_counter()
+        super().connect()
+        # Solo las conexiones nuevas pasan por aquí; la respuesta las descuenta de su espera
+        _MEDICION.conexion = (self._t_tcp, _time.perf_counter() - t0 - self._t_tcp)
+
+class _PoolMedido(urllib3.HTTPSConnectionPool):
+    ConnectionCls = _ConexionMedida
+
+class _AdaptadorMedido(requests.adapters.HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            **self.poolmanager.pool_classes_by_scheme, "https": _PoolMedido
+        }
+
+def _medir_respuesta(r, *args, **kwargs):
+    tcp, tls = getattr(_MEDICION, "conexion", (0.0, 0.0))
+    _MEDICION.conexion = (0.0, 0.0)
+    t0 = _time.perf_counter()
+    r.content  # el cuerpo se lee aquí para medir la transferencia
+    _anotar_fases(**{
+        "conexión": tcp, "TLS": tls,
+        "espera": max(0.0, r.elapsed.total_seconds() - tcp - tls),
+        "transferencia": _time.perf_counter() - t0,
+    })
+    return r
+
+def _renovar_token(credenciales):
+    pedido = _PedidoToken()
+    while True:
+        try:
+            restante = 0.0
+            if credenciales.valid and credenciales.expiry:
+                ahora = datetime.now(timezone.utc).replace(tzinfo=None)  # expiry es UTC sin zona
+                restante = (credenciales.expiry - ahora).total_seconds()
+            if restante <= TOKEN_MARGEN:
+                credenciales.refresh(pedido)
+                restante = (credenciales.expiry - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds()
+            espera = max(30.0, restante - TOKEN_MARGEN)
+        except Exception:
+            espera = 30.0  # sin red: se reintenta; mientras tanto la sesión renueva sola si hace falta
+        _time.sleep(espera)
+
+@st.cache_resource(show_spinner=False)
+def _get_gc(sa_key: str) -> gspread.Client:
+    gc = gspread.service_account_from_dict(st.secrets["gcp_service_account"])
+    gc.set_timeout(HTTP_TIMEOUT)
+    sesion = gc.http_client.session
+    adaptador = _AdaptadorMedido(pool_connections=HTTP_POOL, pool_maxsize=HTTP_POOL, max_retries=0)
+    sesion.mount("https://", adaptador)  # los reintentos los maneja _ClienteSheets
+    sesion.headers.update({
+        "Accept-Encoding": "gzip",
+        "User-Agent": f"asistencia-app (gzip) {requests.utils.default_user_agent()}",
+    })
+    sesion.hooks["response"].append(_medir_respuesta)
+    threading.Thread(target=_renovar_token, args=(gc.http_client.auth,), name="renovar-token", daemon=True).start()
+    return gc
+
+# ---------- Caché de esquema (arranque en frío) ----------
+# El encabezado validado, el id de la pestaña y el tamaño de la cuadrícula se
+# guardan en disco por SHEET_ID. Al arrancar, si la caché coincide con HEADER,
+# se arma la hoja sin llamar a la API y la validación completa corre en
+# segundo plano; así el primer render no depende de la latencia de Google.
+CACHE_DIR = Path(".asistencia_cache")
+ESQUEMA_PATH = CACHE_DIR / "esquema_hojas.json"
+_ESQUEMA_LOCK = threading.Lock()  # los hilos de revalidación escriben el mismo archivo
+
+class _SpreadsheetSinMetadatos(gspread.Spreadsheet):
+    """Spreadsheet armado desde la caché de esquema, sin pedir metadatos a la API."""
+    def __init__(self, http_client, properties):
+        self.client = http_client
+        self._properties = properties
+
+def _leer_esquemas() -> dict:
+    try:
+        return json.loads(ESQUEMA_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def _guardar_esquema(sheet_id: str, sheet_name: str, ws=None):
+    """Guarda el esquema validado de la hoja; con ws=None lo descarta."""
+    clave = f"{sheet_id}|{sheet_name}"
+    entrada = None if ws is None else {
+        "header": list(HEADER),
+        "ws_id": ws.id,
+        "rows": ws.row_count,
+        "cols": ws.col_count,
+        "validado": datetime.now().isoformat(timespec="seconds"),
+    }
+    # Leer-modificar-escribir bajo el lock; el temporal es único por escritura
+    # para que otro proceso con la misma carpeta no lo pise antes del replace
+    with _ESQUEMA_LOCK:
+        esquemas = _leer_esquemas()
+        if entrada is None:
+            esquemas.pop(clave, None)
+        else:
+            esquemas[clave] = entrada
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=CACHE_DIR, prefix=ESQUEMA_PATH.stem,
+                                         suffix=".tmp", delete=False) as tmp:
+            tmp.write(json.dumps(esquemas, ensure_ascii=False, indent=1))
+        try:
+            os.replace(tmp.name, ESQUEMA_PATH)
+        except OSError:
+            Path(tmp.name).unlink(missing_ok=True)
+            raise
+
 def _sa_key():
     try:
         sa = st.secrets["gcp_service_account"]
@@ -52,19 +376,26 @@ def _sa_key():
     except Exception:
         return ""
 
-@st.cache_resource(show_spinner=False)
-def _get_ws_cached(sheet_id: str, sheet_name: str, sa_key: str):
-    if "gcp_service_account" not in st.secrets:
-        raise RuntimeError("Falta el bloque [gcp_service_account] en .streamlit/secrets.toml")
-    gc = gspread.service_account_from_dict(st.secrets["gcp_service_account"])
-    sh = gc.open_by_key(sheet_id)
+def _config_almacen():
+    """Backend de datos y sus opciones: [almacen] en secrets o ASISTENCIA_BACKEND."""
+    try:
+        opciones = dict(st.secrets.get("almacen", {}))
+    except Exception:
+        opciones = {}
+    backend = os.environ.get("ASISTENCIA_BACKEND") or opciones.get("backend", "sheets")
+    opciones.pop("backend", None)
+    return backend, opciones
+
+def _abrir_y_validar(gc, cliente: _ClienteSheets, sheet_id: str, sheet_name: str):
+    sh = _ProxyLimitado(cliente.llamar("open_by_key", "lectura", gc.open_by_key, sheet_id), cliente)
 
     # Obtiene/crea la pestaña
     try:
-        ws = sh.worksheet(sheet_name)
+        ws = _ProxyLimitado(sh.worksheet(sheet_name), cliente)
     except gspread.WorksheetNotFound:
-        ws = sh.add_worksheet(title=sheet_name, rows=2000, cols=len(HEADER))
-        ws.update("A1:H1", [HEADER])
+        # append_rows agranda la cuadrícula a medida: se empieza chica
+        ws = _ProxyLimitado(sh.add_worksheet(title=sheet_name, rows=100, cols=len(HEADER)), cliente)
+        ws.update(f"A1:{ULTIMA_COL}1", [HEADER])
         try: ws.freeze(rows=1)
         except: pass
 
@@ -79,21 +410,267 @@ def _get_ws_cached(sheet_id: str, sheet_name: str, sa_key: str):
     # Asegura encabezado correcto
     first_row = [h.strip().lower() for h in ws.row_values(1)]
     if first_row != HEADER:
-        ws.update("A1:H1", [HEADER])
+        # Migración de la columna fecha (ver "Cambio de esquema"): las pestañas
+        # anteriores tienen 8 columnas de cuadrícula
+        if ws.col_count < len(HEADER):
+            ws.add_cols(len(HEADER) - ws.col_count)
+        ws.update(f"A1:{ULTIMA_COL}1", [HEADER])
         try: ws.freeze(rows=1)
         except: pass
 
     return ws
 
-def _get_ws():
-    return _get_ws_cached(SHEET_ID, SHEET_NAME, _sa_key())
+@st.cache_resource(show_spinner=False)
+def _get_ws_cached(sheet_id: str, sheet_name: str, sa_key: str):
+    backend, opciones = _config_almacen()
+    if backend == "sqlite":
+        return almacen_hojas.abrir_hoja(backend, sheet_id, sheet_name, HEADER, CACHE_DIR, **opciones)
+    if backend != "sheets":
+        # La hoja falsa imita cuota y latencia: pasa por el mismo limitador que Sheets
+        hoja = almacen_hojas.abrir_hoja(backend, sheet_id, sheet_name, HEADER, CACHE_DIR, **opciones)
+        return _ProxyLimitado(hoja, _get_cliente())
+
+    if "gcp_service_account" not in st.secrets:
+        raise RuntimeError("Falta el bloque [gcp_service_account] en .streamlit/secrets.toml")
+    gc = _get_gc(sa_key)
+    cliente = _get_cliente()
+    esquema = _leer_esquemas().get(f"{sheet_id}|{sheet_name}", {})
+    if esquema.get("header") != HEADER:
+        ws = _abrir_y_validar(gc, cliente, sheet_id, sheet_name)
+        _guardar_esquema(sheet_id, sheet_name, ws)
+        return ws
+
+    # Caché válida: hoja armada localmente (0 llamadas) y revalidación perezosa
+    sh = _SpreadsheetSinMetadatos(gc.http_client, {"id": sheet_id, "title": ""})
+    props = {
+        "sheetId": esquema["ws_id"], "title": sheet_name, "index": 0,
+        "gridProperties": {"rowCount": esquema["rows"], "columnCount": esquema["cols"]},
+    }
+    ws = _ProxyLimitado(gspread.Worksheet(sh, props, sheet_id, gc.http_client), cliente)
+
+    def revalidar():
+        try:
+            real = _abrir_y_validar(gc, cliente, sheet_id, sheet_name)
+        except Exception:
+            _guardar_esquema(sheet_id, sheet_name, None)  # el próximo arranque valida en primer plano
+            return
+        ws._obj = real._obj  # si la pestaña se recreó, el proxy pasa a la nueva
+        _guardar_esquema(sheet_id, sheet_name, real)
+
+    threading.Thread(target=revalidar, name="revalidar-esquema", daemon=True).start()
+    return ws
+
+# ---------- Particiones por mes ----------
+# Los envíos nuevos van a una pestaña por mes ("Hoja 1 2025-10") que se crea
+# al primer uso, así la hoja activa (cola, snapshot, réplica) se mantiene chica.
+# SHEET_NAME queda como histórico previo a la partición. El panel admin lee por
+# defecto la partición actual; si se eligen varias, se leen en paralelo.
+PARTICION_FORMATO = "%Y-%m"
+PARTICIONES_TTL = 300  # segundos que se reutiliza la lista de pestañas
+
+def _ahora_cr() -> datetime:
+    return datetime.now(ZoneInfo("America/Costa_Rica")) if ZoneInfo else datetime.now()
+
+def _particion_actual() -> str:
+    return f"{SHEET_NAME} {_ahora_cr().strftime(PARTICION_FORMATO)}"
+
+def _sufijo_hoja(sheet_name: str) -> str:
+    # Archivos locales por pestaña; la base conserva los nombres previos a la partición
+    return "" if sheet_name == SHEET_NAME else "_" + sheet_name[len(SHEET_NAME):].strip()
+
+@st.cache_data(ttl=PARTICIONES_TTL, show_spinner=False)
+def _listar_particiones_cached(sheet_id: str, sheet_name: str, sa_key: str) -> List[str]:
+    ws = _get_ws_cached(sheet_id, _particion_actual(), sa_key)
+    patron = re.compile(re.escape(sheet_name) + r" \d{4}-\d{2}")
+    return [w.title for w in ws.spreadsheet.worksheets() if w.title == sheet_name or patron.fullmatch(w.title)]
+
+def listar_particiones() -> List[str]:
+    """Pestañas con registros: el histórico primero y luego los meses en orden."""
+    nombres = set(_listar_particiones_cached(SHEET_ID, SHEET_NAME, _sa_key()))
+    nombres.add(_particion_actual())
+    return sorted(nombres, key=lambda t: (t != SHEET_NAME, t))
+
+def _get_ws(hoja: str = None):
+    return _get_ws_cached(SHEET_ID, hoja or _particion_actual(), _sa_key())
 
 def init_db():
     _get_ws()
 
+# ---------- Cola de escritura diferida ----------
+# Cada envío se anota primero en un diario local (JSONL) y se confirma al
+# usuario de inmediato; un hilo de fondo lo sube a la hoja por lotes con
+# append_rows. Si el proceso se reinicia, lo pendiente se recupera del diario.
+COLA_ESPERA_LOTE = 1.5   # segundos que se espera para juntar envíos en un lote
+COLA_LOTE_MAX = 200      # filas máximas por append_rows
+COLA_REINTENTO = 10.0    # segundos antes de reintentar tras un error
+
+class _ColaEscritura:
+    def __init__(self, ws, journal_path: Path, identidad):
+        self.ws = ws
+        self.identidad = identidad  # fila → lo que la reconoce en la hoja (None si nada)
+        self.path = journal_path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._evento = threading.Event()
+        self._pendientes = self._leer_diario()
+        self.total_subidos = 0
+        self.ultimo_lote = 0
+        self.ultima_latencia = None
+        self.ultimo_envio = None
+        self.ultimo_error = ""
+        self.al_subir = None  # se llama tras cada lote subido (la réplica de la pestaña)
+        # Lo que quedó en el diario de otra ejecución pudo haber llegado a la hoja
+        self._confirmar = bool(self._pendientes)
+        self._hilo = threading.Thread(target=self._loop, name=f"cola-{self.path.stem}", daemon=True)
+        self._hilo.start()
+        if self._pendientes:
+            self._evento.set()
+
+    def _leer_diario(self) -> list:
+        if not self.path.exists():
+            return []
+        pendientes = []
+        with open(self.path, encoding="utf-8") as f:
+            for linea in f:
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    pendientes.append(json.loads(linea))
+                except ValueError:
+                    pass  # línea truncada por un corte; se descarta
+        return pendientes
+
+    def _reescribir_diario(self):
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for payload in self._pendientes:
+                f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def put(self, payload: list):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._pendientes.append(payload)
+        self._evento.set()
+
+    def pendientes(self) -> list:
+        with self._lock:
+            return list(self._pendientes)
+
+    def profundidad(self) -> int:
+        with self._lock:
+            return len(self._pendientes)
+
+    def _descartar_subidos(self):
+        """Saca de lo pendiente (y del diario) las filas que ya están en la hoja."""
+        en_hoja = {self.identidad(fila) for fila in self.ws.get_all_values()[1:]}
+        en_hoja.discard(None)
+        with self._lock:
+            quedan = [p for p in self._pendientes if self.identidad(p) not in en_hoja]
+            subidos = len(self._pendientes) - len(quedan)
+            if subidos:
+                self._pendientes = quedan
+                self._reescribir_diario()
+        self.total_subidos += subidos
+
+    def _loop(self):
+        while True:
+            self._evento.wait()
+            _time.sleep(COLA_ESPERA_LOTE)  # junta los envíos que llegan en ráfaga
+            self._evento.clear()
+            if self._confirmar:
+                try:
+                    self._descartar_subidos()
+                except Exception as e:
+                    self.ultimo_error = f"{type(e).__name__}: {e}"
+                    _time.sleep(COLA_REINTENTO)
+                    self._evento.set()
+                    continue
+                self._confirmar = False
+            with self._lock:
+                lote = list(self._pendientes[:COLA_LOTE_MAX])
+            if not lote:
+                continue
+            t0 = _time.perf_counter()
+            try:
+                self.ws.append_rows(lote, value_input_option="USER_ENTERED")
+            except Exception as e:
+                self.ultimo_error = f"{type(e).__name__}: {e}"
+                # Si el lote pudo quedar guardado, se confirma contra la hoja antes de reenviarlo
+                self._confirmar = not _sin_efecto(e)
+                _time.sleep(COLA_REINTENTO)
+                self._evento.set()
+                continue
+            # Si el proceso muere entre append_rows y la reescritura del diario,
+            # al reiniciar se confirma contra la hoja qué filas ya llegaron.
+            with self._lock:
+                del self._pendientes[:len(lote)]
+                self._reescribir_diario()
+                quedan = bool(self._pendientes)
+            self.ultima_latencia = _time.perf_counter() - t0
+            self.ultimo_lote = len(lote)
+            self.ultimo_envio = datetime.now()
+            self.total_subidos += len(lote)
+            self.ultimo_error = ""
+            if self.al_subir:
+                self.al_subir()
+            if quedan:
+                self._evento.set()
+
+def _ruta_diario(sheet_id: str, sheet_name: str) -> Path:
+    return CACHE_DIR / f"cola_{Path(__file__).stem}_{sheet_id}{_sufijo_hoja(sheet_name)}.jsonl"
+
+@st.cache_resource(show_spinner=False)
+def _get_cola_cached(sheet_id: str, sheet_name: str, sa_key: str):
+    ws = _get_ws_cached(sheet_id, sheet_name, sa_key)
+    # Una fila ya subida se reconoce por la misma clave con que se evitan los duplicados
+    return _ColaEscritura(ws, _ruta_diario(sheet_id, sheet_name), _clave_fila)
+
+def _get_cola() -> _ColaEscritura:
+    return _get_cola_cached(SHEET_ID, _particion_actual(), _sa_key())
+
+def _hojas_con_diario() -> List[str]:
+    """Pestañas de esta hoja con envíos pendientes en su diario local."""
+    prefijo = f"cola_{Path(__file__).stem}_{SHEET_ID}"
+    hojas = []
+    for ruta in CACHE_DIR.glob("cola_*.jsonl"):
+        if not ruta.stem.startswith(prefijo):
+            continue
+        resto = ruta.stem[len(prefijo):]
+        hoja = f"{SHEET_NAME} {resto[1:]}" if resto.startswith("_") else SHEET_NAME
+        if ruta == _ruta_diario(SHEET_ID, hoja) and ruta.stat().st_size:
+            hojas.append(hoja)
+    return sorted(hojas)
+
+# ---------- Registros duplicados ----------
+# Un doble clic en "Agregar" o un reenvío tras una respuesta lenta no deben
+# sumar otra fila. La clave es (cédula, delegación, fecha del envío): quien
+# asiste a otra reunión el mismo mes se registra sin problema. El snapshot
+# cuenta las claves de la hoja y insert_row la consulta en memoria antes de
+# encolar, sin llamadas a Google Sheets.
+CLAVE_DUPLICADO = ["cedula","delegacion","fecha"]
+_POS_CLAVE = [HEADER.index(c) for c in CLAVE_DUPLICADO]
+
+def _clave(valores) -> tuple:
+    """Clave normalizada (cédula sin espacios ni guiones); None si no hay cédula."""
+    cedula = re.sub(r"[^0-9A-Za-z]", "", str(valores[0])).upper()
+    if not cedula:
+        return None
+    return (cedula,) + tuple(str(v).strip().casefold() for v in valores[1:])
+
+def _clave_fila(fila: list) -> tuple:
+    fila = _pad(fila)
+    return _clave([fila[j] for j in _POS_CLAVE])
+
 # ---------- CRUD ----------
-def insert_row(row: dict):
-    ws = _get_ws()
+def insert_row(row: dict) -> bool:
+    """Encola el registro; False si ya hay uno con la misma clave en la partición."""
     telefono = row.get("Teléfono","")
     if telefono and not str(telefono).startswith("'"):  # conserva ceros iniciales
         telefono = "'" + str(telefono)
@@ -107,84 +684,725 @@ def insert_row(row: dict):
         row.get("Género",""),
         row.get("Sexo",""),
         row.get("Rango de Edad",""),
+        _ahora_cr().strftime("%d/%m/%Y"),
     ]
-    ws.append_row(payload, value_input_option="USER_ENTERED")
-
-def fetch_all_df(include_rownum=True) -> pd.DataFrame:
-    ws = _get_ws()
-    values = ws.get_all_values()
-    if len(values) < 2:
-        cols = ["Nº","Nombre","Cédula de Identidad","Delegación","Cargo","Teléfono","Género","Sexo","Rango de Edad"]
-        if include_rownum: cols.insert(1, "rownum")
-        return pd.DataFrame(columns=cols)
-
-    header = [h.strip().lower() for h in values[0]]
-    data_rows = values[1:]
-
-    name_map = {
-        "nombre":"Nombre",
-        "cedula":"Cédula de Identidad",
-        "delegacion":"Delegación",
-        "cargo":"Cargo",
-        "telefono":"Teléfono",
-        "genero":"Género",
-        "sexo":"Sexo",
-        "edad":"Rango de Edad",
-    }
+    snap = _get_snapshot()
+    snap.asegurar_cargado(_get_cola().pendientes(), _filas_replica)
+    clave = _clave_fila(payload)
+    if clave and not snap.reservar(clave):
+        return False
+    try:
+        _get_cola().put(payload)
+    except Exception:
+        snap.liberar(clave)
+        raise
+    return True
+
+# ---------- Lectura incremental ----------
+# La hoja se mantiene en memoria (matriz cruda + frame parseado). En cada rerun
+# solo se descarga la cola nueva (desde la última fila conocida hasta el final);
+# si esa última fila ya no coincide (borrados o ediciones externas) o venció el
+# TTL, se relee la hoja completa.
+SNAPSHOT_TTL_COMPLETA = 120  # segundos entre relecturas completas de control
+
+NAME_MAP = {
+    "nombre":"Nombre",
+    "cedula":"Cédula de Identidad",
+    "delegacion":"Delegación",
+    "cargo":"Cargo",
+    "telefono":"Teléfono",
+    "genero":"Género",
+    "sexo":"Sexo",
+    "edad":"Rango de Edad",
+    "fecha":"Fecha",
+}
+CAT_COLS = ["Género","Sexo","Rango de Edad","Delegación"]  # baja cardinalidad → categóricos
+COLS_ORDER = ["rownum","Nombre","Cédula de Identidad","Delegación","Cargo","Teléfono","Género","Sexo","Rango de Edad","Fecha"]
+
+def _rows_to_df(header: List[str], rows: List[list], first_rownum: int) -> pd.DataFrame:
+    # Mapeo encabezado→columna calculado una vez; la matriz se rellena una sola
+    # vez al ancho del encabezado y el frame se arma directo desde las columnas.
+    pos = {NAME_MAP[k]: j for j, k in enumerate(header) if k in NAME_MAP}
+    ancho = len(header)
+    matriz = [r if len(r) >= ancho else list(r) + [""] * (ancho - len(r)) for r in rows]
+    columnas = list(zip(*matriz))
+    vacia = [""] * len(matriz)
+    data = {}
+    for col in COLS_ORDER[1:]:
+        j = pos.get(col)
+        data[col] = columnas[j] if j is not None and columnas else vacia
+    # dtype=object explícito: evita que pandas infiera el tipo texto columna por columna
+    df = pd.DataFrame(data, columns=COLS_ORDER[1:], dtype=object)
+    df.insert(0, "rownum", range(first_rownum, first_rownum + len(matriz)))
+    return df
 
-    records = []
-    for idx, row in enumerate(data_rows, start=2):  # fila real en sheet
-        rec = {}
-        for j, key in enumerate(header):
-            if key in name_map:
-                rec[name_map[key]] = row[j] if j < len(row) else ""
-        rec["rownum"] = idx
-        records.append(rec)
-
-    df = pd.DataFrame(records)
-    if df.empty:
-        cols = ["Nº","Nombre","Cédula de Identidad","Delegación","Cargo","Teléfono","Género","Sexo","Rango de Edad"]
-        if include_rownum: cols.insert(1, "rownum")
-        return pd.DataFrame(columns=cols)
-
-    cols_order = ["rownum","Nombre","Cédula de Identidad","Delegación","Cargo","Teléfono","Género","Sexo","Rango de Edad"]
-    df = df[[c for c in cols_order if c in df.columns]]
-
-    df.insert(0, "Nº", range(1, len(df)+1))
-    if not include_rownum and "rownum" in df.columns:
-        df = df.drop(columns=["rownum"])
+_POS_DELEGACION = HEADER.index("delegacion")
+
+def _pad(row: list) -> list:
+    row = list(row)
+    return row + [""] * (len(HEADER) - len(row))
+
+class _SnapshotHoja:
+    def __init__(self, ws):
+        self.ws = ws
+        self._lock = threading.Lock()
+        self.values = []
+        self.df = pd.DataFrame(columns=COLS_ORDER)
+        self._t_completa = 0.0
+        self.lecturas_completas = 0
+        self.lecturas_delta = 0
+        self.version = 0
+        self.por_delegacion = {}  # delegación normalizada → rownums (las listas solo crecen)
+        self.etiquetas = {}       # delegación normalizada → como aparece en la hoja
+        # Claves de duplicado con lock propio: insert_row no espera una lectura en curso
+        self._lock_claves = threading.Lock()
+        self.claves = Counter()   # clave → filas de la hoja con esa clave
+        self._reservadas = set()  # claves encoladas que la hoja todavía no muestra
+        self._cargado = False     # asegurar_cargado() ya corrió
+
+    def invalidar(self):
+        with self._lock:
+            self._t_completa = 0.0
+
+    def _recarga_completa(self):
+        self.values = [list(r) for r in self.ws.get_all_values()]
+        header = [h.strip().lower() for h in self.values[0]] if self.values else list(HEADER)
+        self.df = _rows_to_df(header, self.values[1:], 2)
+        self._reindexar_delegaciones()
+        claves = Counter(k for k in map(_clave_fila, self.values[1:]) if k)
+        with self._lock_claves:
+            self.claves = claves
+            self._reservadas -= claves.keys()
+        self._t_completa = _time.monotonic()
+        self.lecturas_completas += 1
+        self.version += 1
+
+    def asegurar_cargado(self, pendientes: List[list], semilla):
+        """Primer envío del proceso: claves de lo ya guardado y de lo que quedó en el diario.
+
+        Tras un reinicio el snapshot parte vacío hasta la primera lectura del hilo
+        de la réplica. Mientras tanto las claves salen de semilla() (las filas de la
+        réplica local, sin red) y la siguiente lectura completa las reemplaza; los
+        envíos del diario local todavía no están en la hoja.
+        """
+        if self._cargado:
+            return
+        with self._lock:
+            if self._cargado:
+                return
+            with self._lock_claves:
+                if not self.values:
+                    self.claves = Counter(k for k in map(_clave_fila, semilla()) if k)
+                self._reservadas.update(k for k in map(_clave_fila, pendientes) if k and k not in self.claves)
+            self._cargado = True
+
+    def leer(self) -> pd.DataFrame:
+        with self._lock:
+            if not self.values or _time.monotonic() - self._t_completa > SNAPSHOT_TTL_COMPLETA:
+                self._recarga_completa()
+                return self.df
+            n = len(self.values)
+            cola = self.ws.get(f"A{n}:{ULTIMA_COL}")
+            if not cola or _pad(cola[0]) != _pad(self.values[-1]):
+                self._recarga_completa()
+                return self.df
+            nuevas = [list(r) for r in cola[1:]]
+            if nuevas:
+                header = [h.strip().lower() for h in self.values[0]]
+                self.values.extend(nuevas)
+                self._indexar_delegaciones(n + 1)
+                self._contar(nuevas)
+                self.df = pd.concat([self.df, _rows_to_df(header, nuevas, n + 1)], ignore_index=True)
+                self.version += 1
+            self.lecturas_delta += 1
+            return self.df
+
+    def actualizar_filas(self, cambios: dict, col0: int = 0):
+        """Aplica al snapshot lo escrito en la hoja: {rownum: valores desde col0}."""
+        with self._lock:
+            if not self.values or any(r > len(self.values) for r in cambios):
+                self._t_completa = 0.0
+                return
+            header = [h.strip().lower() for h in self.values[0]]
+            self._contar([self.values[r - 1] for r in cambios], -1)
+            for r, vals in cambios.items():
+                fila = _pad(self.values[r - 1])
+                fila[col0:col0 + len(vals)] = list(vals)
+                self.values[r - 1] = fila
+            self._contar([self.values[r - 1] for r in cambios])
+            self._reindexar_delegaciones()
+            nuevas = pd.concat([_rows_to_df(header, [self.values[r - 1]], r) for r in cambios], ignore_index=True)
+            # El frame anterior ya está en manos de quien lo pidió: se cambia una copia
+            df = self.df.copy()
+            pos = pd.Series(df.index, index=df["rownum"])
+            destino = pos.reindex(nuevas["rownum"])
+            ok = destino.notna().values
+            df.loc[destino[ok].astype(int).values, nuevas.columns] = nuevas[ok].values
+            self.df = df
+            self.version += 1
+
+    def eliminar_filas(self, rownums: List[int]):
+        """Quita del snapshot las filas borradas en la hoja y renumera las siguientes."""
+        borrar = sorted(set(int(r) for r in rownums))
+        with self._lock:
+            if not self.values or borrar[-1] > len(self.values):
+                self._t_completa = 0.0
+                return
+            borrar_set = set(borrar)
+            self._contar([self.values[r - 1] for r in borrar if r > 1], -1)
+            self.values = [fila for i, fila in enumerate(self.values, start=1) if i not in borrar_set]
+            self._reindexar_delegaciones()
+            df = self.df[~self.df["rownum"].isin(borrar_set)].reset_index(drop=True)
+            df["rownum"] = df["rownum"] - pd.Index(borrar).searchsorted(df["rownum"].to_numpy())
+            self.df = df
+            self.version += 1
+
+    def vaciar(self):
+        """Deja solo el encabezado, igual que la hoja tras delete_all_rows."""
+        with self._lock:
+            self.values = self.values[:1] or [list(HEADER)]
+            self.df = self.df.iloc[0:0]
+            self._reindexar_delegaciones()
+            with self._lock_claves:
+                self.claves = Counter()
+            self.version += 1
+
+    def foto(self):
+        """Frame y versión actuales, sin tocar la red."""
+        with self._lock:
+            return self.df, self.version
+
+    def _indexar_delegaciones(self, desde: int):
+        """Agrega al índice por delegación las filas desde `desde` (rownum)."""
+        for r in range(desde, len(self.values) + 1):
+            fila = self.values[r - 1]
+            d = str(fila[_POS_DELEGACION]).strip() if len(fila) > _POS_DELEGACION else ""
+            if d:
+                k = d.casefold()
+                self.por_delegacion.setdefault(k, []).append(r)
+                self.etiquetas.setdefault(k, d)
+
+    def _reindexar_delegaciones(self):
+        # Ediciones y borrados mueven filas: índice nuevo, con listas nuevas, para
+        # no alterar las vistas ya entregadas por foto_indice()
+        self.por_delegacion, self.etiquetas = {}, {}
+        self._indexar_delegaciones(2)
+
+    def foto_indice(self):
+        """Como foto(), más el índice por delegación de esa misma versión.
+
+        El índice va como {delegación: (rownums, cuántos)}: las listas solo crecen
+        al final, así que sus primeros `cuántos` valen para el frame entregado.
+        """
+        with self._lock:
+            indice = {k: (filas, len(filas)) for k, filas in self.por_delegacion.items()}
+            return self.df, self.version, indice, dict(self.etiquetas)
+
+    def _contar(self, filas: List[list], signo: int = 1):
+        with self._lock_claves:
+            for fila in filas:
+                k = _clave_fila(fila)
+                if k is None:
+                    continue
+                self.claves[k] += signo
+                if self.claves[k] <= 0:
+                    del self.claves[k]
+                elif signo > 0:
+                    self._reservadas.discard(k)  # el envío ya llegó a la hoja
+
+    def reservar(self, clave: tuple) -> bool:
+        """Anota la clave de un envío; False si ya está en la hoja o en la cola."""
+        with self._lock_claves:
+            if clave in self.claves or clave in self._reservadas:
+                return False
+            self._reservadas.add(clave)
+            return True
+
+    def liberar(self, clave: tuple):
+        with self._lock_claves:
+            self._reservadas.discard(clave)
+
+@st.cache_resource(show_spinner=False)
+def _get_snapshot_cached(sheet_id: str, sheet_name: str, sa_key: str):
+    return _SnapshotHoja(_get_ws_cached(sheet_id, sheet_name, sa_key))
+
+def _get_snapshot(hoja: str = None) -> _SnapshotHoja:
+    return _get_snapshot_cached(SHEET_ID, hoja or _particion_actual(), _sa_key())
+
+# ---------- Réplica local (SQLite) ----------
+# La tabla pública sale de un espejo SQLite de la hoja. Un hilo de fondo lo
+# mantiene al día a partir del snapshot incremental (y con eso, el snapshot de
+# la partición actual que lee el admin); las escrituras siguen yendo a Google
+# Sheets, que es la fuente de verdad. El hilo sincroniza apenas la cola sube un
+# lote propio; los cambios hechos por otros procesos o a mano en la hoja se
+# recogen con una consulta lenta cada REPLICA_SYNC_SEG segundos.
+REPLICA_SYNC_SEG = 60  # por defecto; se ajusta con [replica] sync_seg en secrets
+
+def _replica_sync_seg() -> float:
+    try:
+        return float(st.secrets.get("replica", {}).get("sync_seg", REPLICA_SYNC_SEG))
+    except Exception:
+        return REPLICA_SYNC_SEG
+
+def _replica_path(hoja: str = None) -> Path:
+    return CACHE_DIR / f"replica_{Path(__file__).stem}_{SHEET_ID}{_sufijo_hoja(hoja or _particion_actual())}.db"
+
+def get_conn(hoja: str = None):
+    path = _replica_path(hoja)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return sqlite3.connect(path, check_same_thread=False, timeout=30)
+
+def init_replica(hoja: str = None):
+    with get_conn(hoja) as conn:
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS asistencia(
+            rownum INTEGER PRIMARY KEY,
+            nombre TEXT, cedula TEXT, delegacion TEXT,
+            cargo TEXT, telefono TEXT,
+            genero TEXT, sexo TEXT, edad TEXT, fecha TEXT
+        );
+        """)
+        # Réplicas creadas antes de la columna fecha
+        if "fecha" not in {c[1] for c in conn.execute("PRAGMA table_info(asistencia)")}:
+            conn.execute("ALTER TABLE asistencia ADD COLUMN fecha TEXT;")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_asistencia_delegacion ON asistencia(delegacion);")
+
+class _ReplicaLocal:
+    def __init__(self, snapshot: _SnapshotHoja, hoja: str, intervalo: float):
+        self.snapshot = snapshot
+        self.hoja = hoja
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._aviso = threading.Event()
+        self._version = None
+        self.ultima_sync = None
+        self.ultimo_error = ""
+        init_replica(hoja)
+        with get_conn(hoja) as conn:
+            vacia = conn.execute("SELECT COUNT(*) FROM asistencia").fetchone()[0] == 0
+        if vacia:
+            self.sincronizar()  # primer arranque: sin réplica previa que servir
+        self._hilo = threading.Thread(target=self._loop, name="replica-sync", daemon=True)
+        self._hilo.start()
+
+    def sincronizar(self, leer: bool = True):
+        """Vuelca el snapshot a SQLite si cambió. leer=False evita la consulta a Sheets."""
+        with self._lock:
+            if leer:
+                self.snapshot.leer()
+            df, version = self.snapshot.foto()
+            if version == self._version:
+                return
+            cols = list(NAME_MAP.keys())
+            filas = df[COLS_ORDER].values.tolist()
+            with get_conn(self.hoja) as conn:
+                conn.execute("DELETE FROM asistencia;")
+                conn.executemany(
+                    f"INSERT INTO asistencia (rownum, {', '.join(cols)}) VALUES ({', '.join('?' * (len(cols) + 1))})",
+                    filas
+                )
+            self._version = version
+            self.ultima_sync = datetime.now()
+
+    def avisar(self):
+        """Pide una sincronización sin esperar al intervalo (la hoja cambió)."""
+        self._aviso.set()
+
+    def _loop(self):
+        # Al cambiar de mes la réplica anterior deja de consultar la hoja
+        while self.hoja == _particion_actual():
+            self._aviso.wait(self.intervalo)
+            self._aviso.clear()
+            try:
+                self.sincronizar()
+                self.ultimo_error = ""
+            except Exception as e:
+                self.ultimo_error = f"{type(e).__name__}: {e}"
+
+@st.cache_resource(show_spinner=False)
+def _get_replica_cached(sheet_id: str, sheet_name: str, sa_key: str):
+    replica = _ReplicaLocal(_get_snapshot_cached(sheet_id, sheet_name, sa_key), sheet_name, _replica_sync_seg())
+    # Lo que sube la cola aparece en la tabla pública sin esperar la consulta lenta
+    _get_cola_cached(sheet_id, sheet_name, sa_key).al_subir = replica.avisar
+    return replica
+
+def _get_replica() -> _ReplicaLocal:
+    return _get_replica_cached(SHEET_ID, _particion_actual(), _sa_key())
+
+def _sincronizar_replica(hoja: str = None):
+    # Solo la partición actual tiene réplica; las demás se leen de su snapshot
+    if hoja in (None, _particion_actual()):
+        _get_replica().sincronizar(leer=False)
+
+def _filas_replica(hoja: str = None) -> List[list]:
+    """Filas de la réplica local en el orden de HEADER, sin consultar la hoja."""
+    with get_conn(hoja) as conn:
+        return [list(r) for r in conn.execute(f"SELECT {', '.join(HEADER)} FROM asistencia ORDER BY rownum")]
+
+# ---------- Tabla pública ----------
+# El público ve una página de los registros más recientes: COUNT(*) más un
+# LIMIT/OFFSET sobre la réplica, así cada rerun cuesta lo mismo sin importar
+# el tamaño de la hoja. Los teléfonos no se muestran al público.
+PUBLICO_POR_PAGINA = 50
+COLS_PUBLICAS = ["Nº","Nombre","Cédula de Identidad","Delegación","Cargo","Género","Sexo","Rango de Edad"]
+
+def contar_registros() -> int:
+    with get_conn() as conn:
+        return conn.execute("SELECT COUNT(*) FROM asistencia").fetchone()[0]
+
+def fetch_pagina_publica(pagina: int, total: int) -> pd.DataFrame:
+    """Página `pagina` (1 = la más reciente) de COLS_PUBLICAS, de la más nueva a la más vieja."""
+    columna = {v: k for k, v in NAME_MAP.items()}
+    select = ", ".join(f"{columna[c]} AS '{c}'" for c in COLS_PUBLICAS[1:])
+    desde = (pagina - 1) * PUBLICO_POR_PAGINA
+    with get_conn() as conn:
+        df = pd.read_sql_query(
+            f"SELECT {select} FROM asistencia ORDER BY rownum DESC LIMIT ? OFFSET ?",
+            conn, params=[PUBLICO_POR_PAGINA, desde]
+        )
+    df.insert(0, "Nº", range(total - desde, total - desde - len(df), -1))
     return df
 
-def update_row_by_rownum(rownum:int, row:dict):
-    ws = _get_ws()
-    payload = [
-        row.get("Nombre",""),
-        row.get("Cédula de Identidad",""),
-        row.get("Delegación",""),
-        row.get("Cargo",""),
-        row.get("Teléfono",""),
-        row.get("Género",""),
-        row.get("Sexo",""),
-        row.get("Rango de Edad",""),
+def leer_particiones(hojas: List[str]):
+    """Registros de varias particiones con la columna "Partición", más su índice.
+
+    Cada partición sale de su snapshot con su lectura incremental, en paralelo,
+    así el total tarda lo que la más lenta. La actual también se lee: el hilo de
+    la réplica la consulta cada REPLICA_SYNC_SEG y editar o borrar por rownum
+    sobre una foto vieja tocaría otra fila. El índice es
+    {partición: (fila inicial en el frame, índice por delegación, etiquetas)}.
+    """
+    snapshots = {h: _get_snapshot(h) for h in hojas}
+
+    def leer(hoja):
+        snap = snapshots[hoja]
+        snap.leer()
+        df, _, indice, etiquetas = snap.foto_indice()
+        return df.assign(**{"Partición": hoja}), indice, etiquetas
+
+    with ThreadPoolExecutor(max_workers=min(8, len(hojas)) or 1) as pool:
+        leidas = list(pool.map(leer, hojas))
+
+    frames = [df for df, _, _ in leidas]
+    indices, inicio = {}, 0
+    for hoja, (df, indice, etiquetas) in zip(hojas, leidas):
+        indices[hoja] = (inicio, indice, etiquetas)
+        inicio += len(df)
+
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLS_ORDER + ["Partición"])
+    df.insert(0, "Nº", range(1, len(df) + 1))
+    df[CAT_COLS] = df[CAT_COLS].astype("category")
+    return df, indices
+
+EDIT_FIELDS = ["Nombre","Cédula de Identidad","Delegación","Cargo","Teléfono","Género","Sexo","Rango de Edad"]
+
+def update_rows_by_rownum(cambios: dict, hoja: str = None):
+    """Escribe todas las filas editadas ({rownum: fila}) en un único batch_update."""
+    if not cambios:
+        return
+    ws = _get_ws(hoja)
+    payloads = {int(r): [row.get(f,"") for f in EDIT_FIELDS] for r, row in cambios.items()}
+    ws.batch_update(
+        # A..H: la fecha del envío (columna I) no se edita
+        [{"range": f"A{r}:H{r}", "values": [payload]} for r, payload in payloads.items()],
+        value_input_option="USER_ENTERED"
+    )
+    _get_snapshot(hoja).actualizar_filas(payloads)
+    _sincronizar_replica(hoja)
+
+def update_row_by_rownum(rownum:int, row:dict, hoja: str = None):
+    update_rows_by_rownum({rownum: row}, hoja)
+
+def _rangos_contiguos(rownums: List[int]) -> List[tuple]:
+    """Agrupa números de fila en corridas contiguas [(inicio, fin), ...] ascendentes."""
+    rangos = []
+    for r in sorted(set(int(x) for x in rownums)):
+        if rangos and r == rangos[-1][1] + 1:
+            rangos[-1] = (rangos[-1][0], r)
+        else:
+            rangos.append((r, r))
+    return rangos
+
+def _pedidos_borrado(ws, rownums: List[int]) -> list:
+    # Un deleteDimension por corrida, de abajo hacia arriba para que cada
+    # borrado no desplace los rangos que faltan.
+    return [
+        {"deleteDimension": {"range": {
+            "sheetId": ws.id, "dimension": "ROWS",
+            "startIndex": ini - 1, "endIndex": fin,
+        }}}
+        for ini, fin in reversed(_rangos_contiguos(rownums))
     ]
-    ws.update(f"A{rownum}:H{rownum}", [payload], value_input_option="USER_ENTERED")
 
-def delete_rows_by_rownums(rownums: List[int]):
+def delete_rows_by_rownums(rownums: List[int], hoja: str = None):
     if not rownums:
         return
-    ws = _get_ws()
-    for r in sorted(rownums, reverse=True):
-        ws.delete_rows(r)
+    ws = _get_ws(hoja)
+    ws.spreadsheet.batch_update({"requests": _pedidos_borrado(ws, rownums)})
+    _get_snapshot(hoja).eliminar_filas(rownums)
+    _sincronizar_replica(hoja)
+
+def delete_all_rows(hoja: str = None):
+    ws = _get_ws(hoja)
+    # Sin descargar la hoja: un solo batchUpdate borra los valores desde la
+    # fila 2 (rango abierto) y recorta la cuadrícula a encabezado + 1 fila,
+    # así las lecturas siguientes no recorren miles de filas vacías.
+    ws.spreadsheet.batch_update({"requests": [
+        {"updateCells": {
+            "range": {"sheetId": ws.id, "startRowIndex": 1},
+            "fields": "userEnteredValue",
+        }},
+        {"updateSheetProperties": {
+            "properties": {"sheetId": ws.id, "gridProperties": {"rowCount": 2}},
+            "fields": "gridProperties.rowCount",
+        }},
+    ]})
+    _get_snapshot(hoja).vaciar()
+    _sincronizar_replica(hoja)
+
+def duplicados(df: pd.DataFrame) -> pd.DataFrame:
+    """Filas que repiten la clave de otra anterior de su partición (se conserva la primera)."""
+    claves = [(p, _clave(v)) for p, *v in zip(df["Partición"].astype(str),
+                                              *(df[NAME_MAP[c]].astype(object) for c in CLAVE_DUPLICADO))]
+    repetida = pd.Series(claves, index=df.index, dtype=object).duplicated()
+    con_clave = pd.Series([k is not None for _, k in claves], index=df.index, dtype=bool)
+    return df[repetida & con_clave]
+
+def quitar_duplicados(sobrantes: pd.DataFrame) -> int:
+    """Borra las filas de duplicados() de todas las particiones en un único batchUpdate."""
+    grupos = {h: g["rownum"].tolist() for h, g in sobrantes.groupby("Partición", observed=True, sort=False)}
+    if not grupos:
+        return 0
+    requests = [p for h, rownums in grupos.items() for p in _pedidos_borrado(_get_ws(h), rownums)]
+    _get_ws(next(iter(grupos))).spreadsheet.batch_update({"requests": requests})
+    for h, rownums in grupos.items():
+        _get_snapshot(h).eliminar_filas(rownums)
+        _sincronizar_replica(h)
+    return len(sobrantes)
+
+# ---------- Archivo de registros viejos ----------
+# Las pestañas cuyo último día posible quedó hace más de ARCHIVO_DIAS días se
+# copian a un archivo: otra planilla ([archivo] sheet_id en secrets) o, si no
+# hay, un SQLite local. Luego la pestaña del mes se elimina (la base solo se
+# vacía y recorta), así la operación diaria solo toca el conjunto vivo.
+ARCHIVO_DIAS = 90
+ARCHIVO_TTL = 600     # segundos que se reutiliza la lectura del archivo
+ARCHIVO_LOTE = 5000   # filas por append_rows al archivar
+ARCHIVO_PESTANA = f"Archivo {SHEET_NAME}"
+ARCHIVO_HEADER = ["particion","archivado"] + HEADER
+
+def _archivo_destino() -> str:
+    try:
+        return str(st.secrets.get("archivo", {}).get("sheet_id", ""))
+    except Exception:
+        return ""
+
+@st.cache_resource(show_spinner=False)
+def _get_archivo_cached(destino: str, sa_key: str):
+    if not destino:
+        return almacen_hojas.abrir_hoja("sqlite", SHEET_ID, ARCHIVO_PESTANA, ARCHIVO_HEADER, CACHE_DIR)
+    gc = _get_gc(sa_key)
+    cliente = _get_cliente()
+    sh = _ProxyLimitado(cliente.llamar("open_by_key", "lectura", gc.open_by_key, destino), cliente)
+    try:
+        ws = _ProxyLimitado(sh.worksheet(ARCHIVO_PESTANA), cliente)
+    except gspread.WorksheetNotFound:
+        ws = _ProxyLimitado(sh.add_worksheet(title=ARCHIVO_PESTANA, rows=100, cols=len(ARCHIVO_HEADER)), cliente)
+        ws.update("A1", [ARCHIVO_HEADER])
+        return ws
+    # Archivo creado antes de la columna fecha (ver "Cambio de esquema")
+    if [h.strip().lower() for h in ws.row_values(1)] != ARCHIVO_HEADER:
+        if ws.col_count < len(ARCHIVO_HEADER):
+            ws.add_cols(len(ARCHIVO_HEADER) - ws.col_count)
+        ws.update("A1", [ARCHIVO_HEADER])
+    return ws
 
-def delete_all_rows():
-    ws = _get_ws()
-    used_rows = len(ws.get_all_values())
-    if used_rows >= 2:
-        ws.batch_clear([f"A2:H{used_rows}"])
+def _get_archivo():
+    return _get_archivo_cached(_archivo_destino(), _sa_key())
+
+def _mes_de(hoja: str) -> date:
+    return datetime.strptime(hoja[len(SHEET_NAME):].strip(), PARTICION_FORMATO).date()
+
+def _ultimo_dia(hoja: str, particiones: List[str]) -> date:
+    """Último día que puede tener registros la pestaña."""
+    if hoja == SHEET_NAME:
+        # El histórico es anterior a la primera partición por mes
+        meses = [_mes_de(p) for p in particiones if p != SHEET_NAME]
+        return min(meses) - timedelta(days=1) if meses else date.today()
+    siguiente = (_mes_de(hoja).replace(day=28) + timedelta(days=4)).replace(day=1)
+    return siguiente - timedelta(days=1)
+
+def particiones_a_archivar(dias: int) -> List[str]:
+    particiones = listar_particiones()
+    limite = date.today() - timedelta(days=dias)
+    actual = _particion_actual()
+    if SHEET_NAME in particiones:
+        df_base, version = _get_snapshot(SHEET_NAME).foto()
+        if version and df_base.empty:
+            particiones.remove(SHEET_NAME)  # ya compactada en esta sesión del servidor
+    return [p for p in particiones if p != actual and _ultimo_dia(p, particiones) < limite]
+
+def compactar(hojas: List[str]) -> int:
+    """Copia las pestañas al archivo y las saca del conjunto vivo; devuelve las filas archivadas."""
+    archivo = _get_archivo()
+    sello = datetime.now().isoformat(timespec="seconds")
+    total = 0
+    eliminar = []
+    for hoja in hojas:
+        values = _get_ws(hoja).get_all_values()
+        filas = [[hoja, sello] + _pad(r)[:len(HEADER)] for r in values[1:] if any(str(c).strip() for c in r)]
+        # RAW: el archivo guarda el texto tal cual (cédulas y teléfonos con ceros a la izquierda)
+        for i in range(0, len(filas), ARCHIVO_LOTE):
+            archivo.append_rows(filas[i:i + ARCHIVO_LOTE], value_input_option="RAW")
+        total += len(filas)
+        if hoja == SHEET_NAME:
+            delete_all_rows(hoja)  # la pestaña base se conserva, vacía y recortada
+        else:
+            eliminar.append(hoja)
+
+    if eliminar:
+        ws = _get_ws()
+        ws.spreadsheet.batch_update({"requests": [
+            {"deleteSheet": {"sheetId": _get_ws(h).id}} for h in eliminar
+        ]})
+        for h in eliminar:
+            _guardar_esquema(SHEET_ID, h, None)
+    _listar_particiones_cached.clear()
+    _leer_archivo_cached.clear()
+    return total
+
+@st.cache_data(ttl=ARCHIVO_TTL, show_spinner="Leyendo el archivo…")
+def _leer_archivo_cached(destino: str, sa_key: str) -> pd.DataFrame:
+    values = _get_archivo_cached(destino, sa_key).get_all_values()
+    header = [h.strip().lower() for h in values[0]] if values else ARCHIVO_HEADER
+    filas = values[1:]
+    df = _rows_to_df(header, filas, 2).drop(columns=["rownum"])
+    df.insert(0, "Partición", [r[0] if len(r) > 0 else "" for r in filas])
+    df.insert(1, "Archivado", [r[1] if len(r) > 1 else "" for r in filas])
+    df[CAT_COLS + ["Partición"]] = df[CAT_COLS + ["Partición"]].astype("category")
+    return df
+
+def leer_archivo() -> pd.DataFrame:
+    """Registros archivados; se leen solo cuando el admin los pide y quedan en caché."""
+    return _leer_archivo_cached(_archivo_destino(), _sa_key())
+
+# ---------- Caché de Excel oficiales ----------
+# Volver a generar con los mismos datos devuelve los bytes ya hechos. La clave
+# es un hash del contenido (filas, encabezado, anotaciones, acuerdos, firmante y
+# variante de diseño); la caché es del proceso, compartida entre sesiones, y
+# descarta los menos usados al pasar EXCEL_CACHE_BYTES en total.
+EXCEL_CACHE_BYTES = 64 * 1024 * 1024
+
+class _CacheExcel:
+    def __init__(self, tope: int):
+        self.tope = tope
+        self.total = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._datos = OrderedDict()  # clave -> bytes, del menos al más reciente
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str):
+        with self._lock:
+            datos = self._datos.get(clave)
+            if datos is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return datos
+
+    def guardar(self, clave: str, datos: bytes):
+        if len(datos) > self.tope:
+            return
+        with self._lock:
+            if clave in self._datos:
+                self.total -= len(self._datos.pop(clave))
+            self._datos[clave] = datos
+            self.total += len(datos)
+            while self.total > self.tope:
+                _, viejo = self._datos.popitem(last=False)
+                self.total -= len(viejo)
+
+    def __len__(self):
+        return len(self._datos)
+
+@st.cache_resource(show_spinner=False)
+def _get_cache_excel() -> _CacheExcel:
+    return _CacheExcel(EXCEL_CACHE_BYTES)
+
+def _clave_excel(rows_df: pd.DataFrame, *campos) -> str:
+    """Hash del contenido de un Excel: las filas (en orden) y los demás campos."""
+    h = hashlib.sha256()
+    h.update(repr(campos).encode("utf-8"))
+    h.update(repr(list(rows_df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(rows_df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+# ---------- Exportación en paralelo ----------
+# La exportación por delegación arma los libros en un pool de procesos con
+# lista_oficial.py. Se usa "spawn": los procesos nuevos no heredan los hilos ni
+# los locks del servidor. spawn vuelve a ejecutar el __main__ del padre en cada
+# proceso y Streamlit instala ahí el script de la app, así que todos los
+# procesos se crean de una vez, con un __main__ vacío mientras tanto; con el
+# pool completo, submit ya no crea otros.
+EXCEL_PROCESOS = min(4, os.cpu_count() or 1)
+
+@st.cache_resource(show_spinner=False)
+def _get_pool_excel() -> ProcessPoolExecutor:
+    pool = ProcessPoolExecutor(max_workers=EXCEL_PROCESOS, mp_context=multiprocessing.get_context("spawn"))
+    vacio = types.ModuleType("__main__")
+    principal, sys.modules["__main__"] = sys.modules["__main__"], vacio
+    try:
+        arranque = [pool.submit(lista_oficial.precalentar) for _ in range(EXCEL_PROCESOS)]
+    finally:
+        if sys.modules["__main__"] is vacio:  # otra sesión pudo instalar su script mientras tanto
+            sys.modules["__main__"] = principal
+    wait(arranque)
+    return pool
+
+# ---------- Datos de la ejecución ----------
+# Cada ejecución del panel admin lee los registros una sola vez; la tabla
+# editable, el filtro y la exportación son selecciones sobre ese frame.
+class _DatosCorrida:
+    def __init__(self, particiones: List[str] = None):
+        self.particiones = particiones or [_particion_actual()]
+        self.df, self._indices = leer_particiones(self.particiones)
+
+    def delegaciones(self) -> List[str]:
+        etiquetas = {}
+        for _, indice, etiq in self._indices.values():
+            for k, (_, n) in indice.items():
+                if n:
+                    etiquetas.setdefault(k, etiq[k])
+        return sorted(etiquetas.values(), key=str.casefold)
+
+    def filtrado(self, delegaciones: List[str]) -> pd.DataFrame:
+        """Filas de las delegaciones elegidas, ubicadas con el índice (sin recorrer el frame)."""
+        if not delegaciones:
+            return self.df
+        claves = {str(d).strip().casefold() for d in delegaciones}
+        pos = []
+        for inicio, indice, _ in self._indices.values():
+            for k in claves & indice.keys():
+                filas, n = indice[k]
+                pos.extend(inicio + r - 2 for r in filas[:n])  # rownum 2 = primera fila del bloque
+        return self.df.iloc[sorted(pos)].reset_index(drop=True)
+
+    def exportacion(self, vista: pd.DataFrame) -> pd.DataFrame:
+        return vista.drop(columns=["Nº","rownum","Partición"])
 
 # Inicializa backend
 try:
     init_db()
+    _get_cola()
+    _get_replica()
+    # Diarios de otras pestañas con envíos pendientes: la base (antes de
+    # particionar) o un mes anterior si el proceso se reinició tras el cambio de mes
+    for hoja in _hojas_con_diario():
+        _get_cola_cached(SHEET_ID, hoja, _sa_key())
 except Exception:
     st.error("Error conectando a Google Sheets. Verifica permisos y secrets.")
     st.stop()
@@ -247,16 +1465,27 @@ with st.form("form_asistencia_publico", clear_on_submit=True):
                 "Sexo": sexo,
                 "Rango de Edad": edad
             }
-            insert_row(fila)
-            st.success("Registro guardado.")
+            if insert_row(fila):
+                st.success("Registro guardado.")
+            else:
+                st.info("Ese registro ya estaba guardado hoy (misma cédula y delegación); no se agregó de nuevo.")
 
 st.markdown("### 📥 Registros recibidos")
-df_pub = fetch_all_df(include_rownum=False)
-if not df_pub.empty:
+en_cola = _get_cola().profundidad()
+if en_cola:
+    st.caption(f"⏳ {en_cola} registro(s) en cola de envío; aparecerán en la tabla en unos segundos.")
+total_pub = contar_registros()
+if total_pub:
+    paginas = -(-total_pub // PUBLICO_POR_PAGINA)
+    pagina = 1
+    if paginas > 1:
+        pagina = st.columns([1, 4])[0].number_input("Página", min_value=1, max_value=paginas, value=1, step=1,
+                                                    help="1 = los registros más recientes")
     st.dataframe(
-        df_pub[["Nº","Nombre","Cédula de Identidad","Delegación","Cargo","Teléfono","Género","Sexo","Rango de Edad"]],
+        fetch_pagina_publica(int(pagina), total_pub),
         use_container_width=True, hide_index=True
     )
+    st.caption(f"Página {pagina} de {paginas} · {total_pub} registro(s), los más recientes primero.")
 else:
     st.info("Aún no hay registros guardados.")
 
@@ -265,13 +1494,73 @@ if st.session_state.is_admin:
     st.markdown("---")
     st.markdown("# 🛠️ Panel del Administrador")
 
-    df_all = fetch_all_df(include_rownum=True)
+    # === Estado de la cola de escritura ===
+    cola = _get_cola()
+    q1, q2, q3 = st.columns(3)
+    q1.metric("Envíos en cola", cola.profundidad())
+    q2.metric(
+        "Última subida",
+        f"{cola.ultima_latencia*1000:.0f} ms" if cola.ultima_latencia is not None else "—",
+        help=f"Lote de {cola.ultimo_lote} fila(s)" + (f" a las {cola.ultimo_envio:%H:%M:%S}" if cola.ultimo_envio else "")
+    )
+    q3.metric("Subidos desde el arranque", cola.total_subidos)
+    if cola.ultimo_error:
+        st.warning(f"La cola reintentará la subida. Último error: {cola.ultimo_error}")
+    replica = _get_replica()
+    if replica.ultima_sync:
+        st.caption(f"Réplica local sincronizada a las {replica.ultima_sync:%H:%M:%S}.")
+    if replica.ultimo_error:
+        st.warning(f"No se pudo sincronizar la réplica local. Último error: {replica.ultimo_error}")
+
+    cliente = _get_cliente()
+    if cliente.circuito_abierto():
+        st.error("Google Sheets está rechazando solicitudes; las escrituras quedan en la cola local hasta que se recupere.")
+    with st.expander("📈 Llamadas a Google Sheets"):
+        st.caption(f"Backend de datos: {_config_almacen()[0]}")
+        st.dataframe(cliente.resumen(), use_container_width=True, hide_index=True)
+
+    with st.expander("🗄️ Archivo de registros viejos"):
+        destino = _archivo_destino()
+        st.caption(f"Destino: planilla {destino}" if destino else
+                   "Destino: SQLite local en el servidor. Configura [archivo] sheet_id en secrets para un archivo permanente.")
+        dias = st.number_input("Archivar pestañas con registros de hace más de (días)",
+                               min_value=1, value=ARCHIVO_DIAS, step=30)
+        candidatas = particiones_a_archivar(int(dias))
+        if candidatas:
+            st.write("Se archivarán: " + ", ".join(candidatas))
+            if st.button("🗄️ Compactar ahora"):
+                try:
+                    n = compactar(candidatas)
+                except Exception as e:
+                    st.error(f"No se pudo completar la compactación: {e}")
+                    st.stop()
+                st.success(f"Se archivaron {n} registro(s) de {len(candidatas)} pestaña(s).")
+                st.rerun()
+        else:
+            st.caption("No hay pestañas para archivar con ese plazo.")
+        if st.checkbox("Consultar archivo", value=False):
+            df_arch = leer_archivo()
+            st.dataframe(df_arch, use_container_width=True, hide_index=True)
+            st.download_button("⬇️ Descargar archivo (CSV)", df_arch.to_csv(index=False).encode("utf-8-sig"),
+                               file_name="asistencia_archivo.csv", mime="text/csv")
+
+    # === Particiones (una pestaña por mes) ===
+    actual = _particion_actual()
+    sel_particiones = st.multiselect(
+        "Particiones",
+        options=listar_particiones(),
+        default=[actual],
+        help=f"Por defecto solo el mes en curso. '{SHEET_NAME}' guarda los registros anteriores a la partición por mes."
+    )
+    datos = _DatosCorrida(sel_particiones)
+
+    df_all = datos.df
     if df_all.empty:
         st.info("Aún no hay registros guardados.")
         st.stop()
 
     # === Multiselección de delegaciones ===
-    delegs_existentes = sorted([d for d in df_all["Delegación"].dropna().unique() if str(d).strip()], key=str.casefold)
+    delegs_existentes = datos.delegaciones()
     sel_filtros = st.multiselect(
         "Filtrar por Delegación",
         options=delegs_existentes,
@@ -279,10 +1568,7 @@ if st.session_state.is_admin:
         help="Vacío = todas. Puedes elegir varias delegaciones."
     )
 
-    if not sel_filtros:
-        df_view = df_all.copy().reset_index(drop=True)
-    else:
-        df_view = df_all[df_all["Delegación"].isin(sel_filtros)].reset_index(drop=True)
+    df_view = datos.filtrado(sel_filtros)
 
     # Encabezado Excel
     st.markdown("### 🧾 Datos de encabezado (Excel)")
@@ -307,7 +1593,7 @@ if st.session_state.is_admin:
     if df_view.empty:
         st.info("No hay registros para el filtro seleccionado.")
     else:
-        editable = df_view.copy()
+        editable = df_view.astype({c: object for c in CAT_COLS})  # el editor admite texto libre
         editable["Seleccionar"] = False
 
         edited = st.data_editor(
@@ -333,25 +1619,38 @@ if st.session_state.is_admin:
         btn_clear = c3.button("🧹 Vaciar todos", use_container_width=True)
 
         if btn_save:
-            changes = 0
-            for idx in edited.index:
-                if idx >= len(df_view):
-                    continue
-                row_orig = df_view.loc[idx]
-                row_new  = edited.loc[idx]
-                fields = ["Nombre","Cédula de Identidad","Delegación","Cargo","Teléfono","Género","Sexo","Rango de Edad"]
-                if any(str(row_orig[f]) != str(row_new[f]) for f in fields):
-                    update_row_by_rownum(int(row_orig["rownum"]), {f: row_new[f] for f in fields})
-                    changes += 1
+            comunes = edited.index.intersection(df_view.index)
+            orig = df_view.loc[comunes, EDIT_FIELDS].astype(str).to_numpy()
+            nuevo = edited.loc[comunes, EDIT_FIELDS].astype(str).to_numpy()
+            idx_cambio = comunes[(orig != nuevo).any(axis=1)]
+            cambios = {}  # {partición: {rownum: fila}}
+            for (hoja, r), fila in zip(
+                df_view.loc[idx_cambio, ["Partición","rownum"]].itertuples(index=False),
+                edited.loc[idx_cambio, EDIT_FIELDS].to_dict("records")
+            ):
+                cambios.setdefault(hoja, {})[int(r)] = fila
+            try:
+                for hoja, filas in cambios.items():
+                    update_rows_by_rownum(filas, hoja)
+            except Exception as e:
+                st.error(f"No se pudieron guardar los cambios en Google Sheets: {e}")
+                st.stop()
+            changes = sum(len(f) for f in cambios.values())
             st.success(f"Se guardaron {changes} cambio(s).") if changes else st.info("No hay cambios para guardar.")
             if changes:
                 st.rerun()
 
         if btn_delete:
             idx_sel = edited.index[edited["Seleccionar"] == True].tolist()
-            rownums = df_view.iloc[idx_sel]["rownum"].tolist()
+            sel = df_view.iloc[idx_sel]
+            rownums = sel["rownum"].tolist()
             if rownums:
-                delete_rows_by_rownums(rownums)
+                try:
+                    for hoja, grupo in sel.groupby("Partición", observed=True, sort=False):
+                        delete_rows_by_rownums(grupo["rownum"].tolist(), hoja)
+                except Exception as e:
+                    st.error(f"No se pudieron eliminar las filas en Google Sheets: {e}")
+                    st.stop()
                 st.success(f"Eliminadas {len(rownums)} fila(s).")
                 st.rerun()
             else:
@@ -359,293 +1658,72 @@ if st.session_state.is_admin:
 
         if btn_clear:
             if confirm_all:
-                delete_all_rows()
+                try:
+                    for hoja in datos.particiones:
+                        delete_all_rows(hoja)
+                except Exception as e:
+                    st.error(f"No se pudo vaciar la hoja en Google Sheets: {e}")
+                    st.stop()
                 st.success("Se vaciaron todos los registros.")
                 st.rerun()
             else:
                 st.warning("Marca 'Confirmar vaciado total' para continuar.")
 
+        # === Duplicados ya guardados (misma cédula, delegación y fecha) ===
+        sobrantes = duplicados(df_all)
+        if not sobrantes.empty:
+            d1, d2 = st.columns([3, 1.2])
+            d1.warning(f"Hay {len(sobrantes)} registro(s) repetidos; se conservaría el primero de cada cédula por día.")
+            if d2.button("🧽 Quitar duplicados", use_container_width=True):
+                try:
+                    n = quitar_duplicados(sobrantes)
+                except Exception as e:
+                    st.error(f"No se pudieron quitar los duplicados en Google Sheets: {e}")
+                    st.stop()
+                st.success(f"Se eliminaron {n} registro(s) repetidos.")
+                st.rerun()
+
     # ========= Excel oficial =========
     st.markdown("### ⬇️ Descarga")
 
-    df_for_export = df_view.drop(columns=["Nº","rownum"]) if not df_view.empty else df_view
+    df_for_export = datos.exportacion(df_view)
 
-    def build_excel_oficial_single(
-        fecha: date, lugar: str, hora_ini: time, hora_fin: time,
-        estrategia: str, delegacion_hdr: str, rows_df: pd.DataFrame,
-        anotaciones_txt: str, acuerdos_txt: str, firmante: str
-    ) -> bytes:
-        try:
-            from openpyxl import Workbook
-            from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-            from openpyxl.utils import get_column_letter
-            from openpyxl.drawing.image import Image as XLImage
-            from pathlib import Path as _Path
-        except Exception:
-            st.error("Falta 'openpyxl' (y Pillow) en requirements.txt")
-            return b""
-
-        # 🔸 SIN AUTOINFERENCIA: usamos exactamente lo que venga en delegacion_hdr (puede ser vacío)
-        azul_banda = "1F3B73"
-        gris_head  = "D9D9D9"
-        celda_fill = PatternFill("solid", fgColor=gris_head)
-        th_font    = Font(bold=True)
-        title_font = Font(bold=True, size=12)
-        h1_font    = Font(bold=True, size=14)
-        center     = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        right      = Alignment(horizontal="right",  vertical="center")
-        left       = Alignment(horizontal="left",   vertical="top", wrap_text=True)
-        thin       = Side(style="thin", color="000000")
-        border_all = Border(left=thin, right=thin, top=thin, bottom=thin)
-
-        def outline_box(r1, c1, r2, c2):
-            for c in range(c1, c2+1):
-                t = ws.cell(row=r1, column=c)
-                t.border = Border(top=thin, left=t.border.left, right=t.border.right, bottom=t.border.bottom)
-                b = ws.cell(row=r2, column=c)
-                b.border = Border(bottom=thin, left=b.border.left, right=b.border.right, top=b.border.top)
-            for r in range(r1, r2+1):
-                l = ws.cell(row=r, column=c1)
-                l.border = Border(left=thin, top=l.border.top, right=l.border.right, bottom=l.border.bottom)
-                rgt = ws.cell(row=r, column=c2)
-                rgt.border = Border(right=thin, top=rgt.border.top, left=rgt.border.left, bottom=rgt.border.bottom)
-
-        def box_all(r1, c1, r2, c2):
-            for r in range(r1, r2+1):
-                for c in range(c1, c2+1):
-                    ws.cell(row=r, column=c).border = border_all
-
-        MESES_ES = ["enero","febrero","marzo","abril","mayo","junio","julio","agosto",
-                    "septiembre","octubre","noviembre","diciembre"]
-        mes_es = MESES_ES[fecha.month-1]
-
-        wb = Workbook()
-        ws = wb.active; ws.title = "Lista"
-        ws.sheet_view.showGridLines = False
-
-        # Página
-        ws.page_setup.orientation = ws.ORIENTATION_PORTRAIT
-        ws.page_setup.paperSize = ws.PAPERSIZE_A4
-        ws.page_setup.fitToWidth = 1
-        ws.page_setup.fitToHeight = 0
-        ws.page_margins.left = ws.page_margins.right = 0.3
-        ws.page_margins.top = ws.page_margins.bottom = 0.4
-
-        # Columnas (ensanchar Cargo y Teléfono)
-        widths = {
-            "A": 2,  "B": 6,  "C": 26, "D": 22, "E": 22,
-            "F": 18, "G": 24, "H": 28, "I": 20,
-            "J": 6,  "K": 6,  "L": 10, "M": 6,  "N": 6, "O": 6,
-            "P": 14, "Q": 14, "R": 14, "S": 16
-        }
-        for col, w in widths.items():
-            ws.column_dimensions[col].width = w
-
-        # Alturas del encabezado
-        ws.row_dimensions[1].height = 8
-        ws.row_dimensions[3].height = 50
-        ws.row_dimensions[4].height = 22
-        ws.row_dimensions[5].height = 18
-        ws.row_dimensions[6].height = 14
+    def _clave_lista(rows_df: pd.DataFrame, delegacion: str) -> str:
+        return _clave_excel(
+            rows_df, fecha_evento, lugar, hora_inicio, hora_fin, estrategia, delegacion,
+            anotaciones, acuerdos, firmante_nombre,
+            (lista_oficial.NOTAS_ALTO, lista_oficial.NOTAS_BASE, lista_oficial.FILAS_STREAMING)
+        )
 
-        # Logos (opcionales)
+    def _args_lista(rows_df: pd.DataFrame, delegacion: str) -> tuple:
+        """Argumentos de lista_oficial.build_excel_oficial_single con el encabezado del formulario."""
+        return (fecha_evento, lugar, hora_inicio, hora_fin, estrategia, delegacion,
+                rows_df, anotaciones, acuerdos, firmante_nombre)
+
+    def excel_oficial(rows_df: pd.DataFrame, delegacion: str):
+        """Excel oficial de rows_df con el encabezado del formulario, pasando por la caché.
+
+        Devuelve (bytes, True si salió de la caché).
+        """
+        cache_excel = _get_cache_excel()
+        clave = _clave_lista(rows_df, delegacion)
+        xls_bytes = cache_excel.obtener(clave)
+        if xls_bytes is not None:
+            return xls_bytes, True
         try:
-            if _Path("logo_izq.png").exists():
-                img = XLImage("logo_izq.png")
-                target_h = 72
-                ratio = target_h / img.height
-                img.height = target_h
-                img.width  = int(img.width * ratio)
-                ws.add_image(img, "D3")
-            if _Path("logo_der.png").exists():
-                img2 = XLImage("logo_der.png")
-                target_h2 = 72
-                ratio2 = target_h2 / img2.height
-                img2.height = target_h2
-                img2.width  = int(img2.width * ratio2)
-                ws.add_image(img2, "O3")
-        except Exception:
-            pass
-
-        # Títulos
-        ws.merge_cells("B3:S3"); ws["B3"].value = "Modelo de Gestión Policial de Fuerza Pública"; ws["B3"].alignment=center; ws["B3"].font=h1_font
-        ws.merge_cells("B4:S4"); ws["B4"].value = "Lista de Asistencia & Minuta"; ws["B4"].alignment=center; ws["B4"].font=h1_font
-        ws.merge_cells("B5:S5"); ws["B5"].value = "Consecutivo:"; ws["B5"].alignment=center; ws["B5"].font=title_font
-        ws.merge_cells("B6:S6"); ws["B6"].fill = PatternFill("solid", fgColor="1F3B73")
-        outline_box(1, 2, 6, 19)
-
-        # Encabezado superior
-        ws.merge_cells(start_row=7, start_column=2, end_row=7, end_column=4)
-        ws.merge_cells(start_row=7, start_column=5, end_row=7, end_column=9)
-        ws.merge_cells(start_row=7, start_column=10, end_row=7, end_column=15)
-        ws.merge_cells(start_row=7, start_column=16, end_row=7, end_column=19)
-        ws["B7"].value = f"Fecha: {fecha.day} {mes_es} {fecha.year}"; ws["B7"].font = title_font; ws["B7"].alignment = left
-        ws["E7"].value = f"Lugar:  {lugar}" if lugar else "Lugar: "; ws["E7"].font = title_font; ws["E7"].alignment = left
-        ws["J7"].value = f"Hora Inicio: {hora_ini.strftime('%H:%M')}"; ws["J7"].alignment = center
-        ws["P7"].value = f"Hora Finalización: {hora_fin.strftime('%H:%M')}"; ws["P7"].alignment = center
-        box_all(7, 2, 7, 4); box_all(7, 5, 7, 9); box_all(7, 10, 7, 15); box_all(7, 16, 7, 19)
-
-        # Estrategia
-        ws.merge_cells(start_row=8, start_column=2, end_row=8, end_column=3)
-        ws.merge_cells(start_row=8, start_column=4, end_row=8, end_column=9)
-        ws["B8"].value = "Estrategia o Programa:"; ws["B8"].alignment = left
-        ws["D8"].value = estrategia; ws["D8"].alignment = left
-        box_all(8, 2, 8, 3); box_all(8, 4, 8, 9)
-
-        # Actividad
-        ws.merge_cells(start_row=8, start_column=10, end_row=9, end_column=19)
-        ws["J8"].value = "ACTIVIDAD: Reunión Virtual de Seguimiento de líneas de acción, acciones estratégicas, indicadores y metas."
-        ws["J8"].alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
-        outline_box(8, 10, 9, 19)
-
-        # Delegación (tal cual venga del input, puede ser vacío)
-        ws.merge_cells(start_row=9, start_column=2, end_row=9, end_column=3)
-        ws.merge_cells(start_row=9, start_column=4, end_row=9, end_column=9)
-        ws["B9"].value = "Dirección / Delegación Policial:"; ws["B9"].alignment = left
-        ws["D9"].value = delegacion_hdr
-        ws["D9"].alignment = left
-        box_all(9, 2, 9, 3); box_all(9, 4, 9, 9)
-
-        # Encabezado tabla
-        ws["B10"].value = ""
-        ws.merge_cells("C10:E11"); ws["C10"].value = "Nombre"
-
-        ws["F10"].value = "Cédula de Identidad"
-        ws["G10"].value = "Delegación"
-        ws["H10"].value = "Cargo"
-        ws["I10"].value = "Teléfono"
-        ws.merge_cells("J10:L10"); ws["J10"].value = "Género"
-        ws.merge_cells("M10:O10"); ws["M10"].value = "Sexo (Hombre, Mujer o Intersex)"
-        ws.merge_cells("P10:R10"); ws["P10"].value = "Rango de Edad"
-        ws["S10"].value = "FIRMA"
-
-        for rng in ["C10:E11","J10:L10","M10:O10","P10:R10"]:
-            c = ws[rng.split(":")[0]]
-            c.font = th_font; c.alignment = center; c.fill = celda_fill
-        for cell in ["F10","G10","H10","I10","S10"]:
-            ws[cell].font = th_font; ws[cell].alignment = center; ws[cell].fill = celda_fill
-
-        ws["J11"], ws["K11"], ws["L11"] = "F", "M", "LGBTIQ+"
-        ws["M11"], ws["N11"], ws["O11"] = "H", "M", "I"
-        ws["P11"], ws["Q11"], ws["R11"] = "18 a 35 años", "36 a 64 años", "65 años o más"
-        for cell in ["J11","K11","L11","M11","N11","O11","P11","Q11","R11"]:
-            ws[cell].font = th_font; ws[cell].alignment = center; ws[cell].fill = celda_fill
-
-        for r in range(10, 12):
-            for c in range(2, 20):
-                ws.cell(row=r, column=c).border = border_all
-
-        ws.freeze_panes = "A12"
-
-        # Filas
-        start_row = 12
-        for i, (_, row) in enumerate(rows_df.iterrows()):
-            r = start_row + i
-            ws[f"B{r}"].value = i + 1
-            ws[f"B{r}"].alignment = right
-
-            # Nombre (C..E)
-            ws.merge_cells(start_row=r, start_column=3, end_row=r, end_column=5)
-            ws[f"C{r}"].value = str(row.get("Nombre",""))
-            ws[f"C{r}"].alignment = left
-
-            # Cédula / Delegación / Cargo / Teléfono
-            ws[f"F{r}"].value = str(row.get("Cédula de Identidad",""))
-            ws[f"G{r}"].value = str(row.get("Delegación",""))
-            ws[f"H{r}"].value = str(row.get("Cargo",""))
-            ws[f"I{r}"].value = str(row.get("Teléfono",""))
-            for col in ["F","G","H","I"]:
-                ws[f"{col}{r}"].alignment = left
-
-            # Marcas X
-            for col in ["J","K","L","M","N","O","P","Q","R"]:
-                ws[f"{col}{r}"].value = ""
-
-            g = (row.get("Género","") or "").strip()
-            if g == "F": ws[f"J{r}"].value = "X"
-            elif g == "M": ws[f"K{r}"].value = "X"
-            elif g == "LGBTIQ+": ws[f"L{r}"].value = "X"
-
-            s = (row.get("Sexo","") or "").strip()
-            if s == "H": ws[f"M{r}"].value = "X"
-            elif s == "M": ws[f"N{r}"].value = "X"
-            elif s == "I": ws[f"O{r}"].value = "X"
-
-            e = (row.get("Rango de Edad","") or "").strip()
-            if e.startswith("18"): ws[f"P{r}"].value = "X"
-            elif e.startswith("36"): ws[f"Q{r}"].value = "X"
-            elif e.startswith("65"): ws[f"R{r}"].value = "X"
-
-            ws[f"S{r}"].value = "Virtual"
-
-            for c in range(2, 20):
-                ws.cell(row=r, column=c).border = border_all
-
-        # Anotaciones / Acuerdos
-        last_data_row = start_row + len(rows_df) - 1 if len(rows_df) > 0 else 11
-        notes_top = max(25, last_data_row + 2)
-        notes_height = 14
-
-        ws.merge_cells(start_row=notes_top, start_column=2, end_row=notes_top, end_column=10)
-        ws.merge_cells(start_row=notes_top, start_column=12, end_row=notes_top, end_column=19)
-        ws[f"B{notes_top}"].value = "Anotaciones Generales."; ws[f"B{notes_top}"].alignment = center
-        ws[f"L{notes_top}"].value = "Acuerdos."; ws[f"L{notes_top}"].alignment = center
-        ws[f"B{notes_top}"].font = th_font; ws[f"L{notes_top}"].font = th_font
-        ws[f"B{notes_top}"].fill = celda_fill; ws[f"L{notes_top}"].fill = celda_fill
-
-        outline_box(notes_top+1, 2, notes_top+notes_height, 10)
-        outline_box(notes_top+1, 12, notes_top+notes_height, 19)
-
-        ws.merge_cells(start_row=notes_top+1, start_column=2, end_row=notes_top+notes_height, end_column=10)
-        ws[f"B{notes_top+1}"].alignment = left
-        if anotaciones_txt.strip(): ws[f"B{notes_top+1}"].value = anotaciones_txt.strip()
-
-        ws.merge_cells(start_row=notes_top+1, start_column=12, end_row=notes_top+notes_height, end_column=19)
-        ws[f"L{notes_top+1}"].alignment = left
-        if acuerdos_txt.strip(): ws[f"L{notes_top+1}"].value = acuerdos_txt.strip()
-
-        # Pie / Firma
-        row_pie = notes_top + notes_height + 2
-        ws.merge_cells(start_row=row_pie, start_column=2, end_row=row_pie, end_column=10)
-        ws[f"B{row_pie}"].value = f"Se Finaliza la Reunión a:   {hora_fin.strftime('%H:%M')}"
-        ws[f"B{row_pie}"].alignment = left
-
-        row_firma = row_pie + 3
-        thin_line = Side(style="thin", color="000000")
-        sig_c1, sig_c2 = 4, 10  # D..J
-        ws.merge_cells(start_row=row_firma, start_column=sig_c1, end_row=row_firma, end_column=sig_c2)
-        for c in range(sig_c1, sig_c2 + 1):
-            ws.cell(row=row_firma, column=c).border = Border(bottom=thin_line)
-
-        col = get_column_letter(sig_c1)
-        ws.row_dimensions[row_firma].height = 24
-
-        ws[f"{col}{row_firma}"].value = (firmante or "").strip()
-        ws[f"{col}{row_firma}"].alignment = Alignment(horizontal="center", vertical="bottom")
-
-        ws.merge_cells(start_row=row_firma+1, start_column=sig_c1, end_row=row_firma+1, end_column=sig_c2)
-        ws[f"{col}{row_firma+1}"].value = "Nombre"
-        ws[f"{col}{row_firma+1}"].alignment = Alignment(horizontal="center")
-
-        ws.merge_cells(start_row=row_firma+3, start_column=2, end_row=row_firma+3, end_column=10)
-        ws[f"B{row_firma+3}"].value = "Cargo:"
-        ws[f"B{row_firma+3}"].alignment = left
-
-        ws.merge_cells(start_row=row_firma+5, start_column=12, end_row=row_firma+5, end_column=19)
-        ws[f"L{row_firma+5}"].value = "Sello Policial"
-        ws[f"L{row_firma+5}"].alignment = Alignment(horizontal="right", vertical="center")
-
-        ws.protection.sheet = True
-        ws.protection.selectLockedCells = True
-        ws.protection.selectUnlockedCells = True
-
-        bio = BytesIO(); wb.save(bio); return bio.getvalue()
+            xls_bytes = lista_oficial.build_excel_oficial_single(*_args_lista(rows_df, delegacion))
+        except ImportError:
+            st.error("Falta 'openpyxl' (y Pillow) en requirements.txt")
+            return b"", False
+        cache_excel.guardar(clave, xls_bytes)
+        return xls_bytes, False
 
     if st.button("📥 Generar Excel oficial", use_container_width=True, type="primary"):
-        xls_bytes = build_excel_oficial_single(
-            fecha_evento, lugar, hora_inicio, hora_fin, estrategia, delegacion_hdr,
-            df_for_export, anotaciones, acuerdos, firmante_nombre
-        )
+        xls_bytes, reutilizado = excel_oficial(df_for_export, delegacion_hdr)
+        if reutilizado:
+            cache_excel = _get_cache_excel()
+            st.caption(f"♻️ Sin cambios desde la última generación: se reutilizó el archivo "
+                       f"({len(cache_excel)} en caché, {cache_excel.total / 1024 / 1024:.1f} MB).")
         if xls_bytes:
             st.download_button(
                 "⬇️ Descargar Excel (una sola hoja)",
@@ -655,6 +1733,82 @@ if st.session_state.is_admin:
                 use_container_width=True
             )
 
+    # Una lista oficial por delegación (las filtradas o, si no hay filtro, todas),
+    # cada una con su delegación en el encabezado, dentro de un solo ZIP.
+    if st.button("🗂️ Exportar todas las delegaciones (ZIP)", use_container_width=True):
+        delegs_zip = sel_filtros or delegs_existentes
+        cache_excel = _get_cache_excel()
+        barra = st.progress(0.0, text="Generando listas…")
+        t0 = _time.perf_counter()
+
+        # Nombre de cada archivo, fijado antes de repartir el trabajo
+        archivos, usados = {}, set()
+        for deleg in delegs_zip:
+            base = re.sub(r'[\\/:*?"<>|]+', "_", str(deleg)).strip() or "Sin delegación"
+            nombre, n = base, 1
+            while nombre.casefold() in usados:
+                n += 1; nombre = f"{base} ({n})"
+            usados.add(nombre.casefold())
+            archivos[deleg] = f"Lista_Asistencia_{nombre}_{date.today():%Y%m%d}.xlsx"
+
+        # Lo que está en la caché se toma de una vez; el resto se arma en el pool
+        libros, fallidas = {}, []
+        pool, futuros = _get_pool_excel(), {}
+        for deleg in delegs_zip:
+            rows_df = datos.exportacion(datos.filtrado([deleg]))
+            clave = _clave_lista(rows_df, deleg)
+            xls_bytes = cache_excel.obtener(clave)
+            if xls_bytes is not None:
+                libros[deleg] = xls_bytes
+                continue
+            try:
+                futuro = pool.submit(lista_oficial.build_excel_oficial_single, *_args_lista(rows_df, deleg))
+            except BrokenProcessPool:  # un proceso del pool murió desde el último uso
+                _get_pool_excel.clear()
+                pool = _get_pool_excel()
+                futuro = pool.submit(lista_oficial.build_excel_oficial_single, *_args_lista(rows_df, deleg))
+            futuros[futuro] = (deleg, clave)
+        reutilizados = len(libros)
+
+        for k, futuro in enumerate(as_completed(futuros), reutilizados + 1):
+            deleg, clave = futuros[futuro]
+            try:
+                xls_bytes = futuro.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    _get_pool_excel.clear()  # la próxima exportación arranca un pool nuevo
+                fallidas.append(f"{deleg or 'Sin delegación'} ({type(e).__name__}: {e})")
+            else:
+                cache_excel.guardar(clave, xls_bytes)
+                libros[deleg] = xls_bytes
+            barra.progress(k / len(delegs_zip), text=f"{k}/{len(delegs_zip)} · {deleg}")
+        barra.empty()
+
+        # Se escriben en el orden de la selección, no en el que terminaron
+        zbuf, listas = BytesIO(), 0
+        # Los .xlsx ya vienen comprimidos: se guardan sin volver a comprimir
+        with zipfile.ZipFile(zbuf, "w", compression=zipfile.ZIP_STORED) as zf:
+            for deleg in delegs_zip:
+                if deleg in libros:
+                    zf.writestr(archivos[deleg], libros[deleg])
+                    listas += 1
+
+        if fallidas:
+            st.warning(f"No se pudo generar la lista de {len(fallidas)} delegación(es); el ZIP sale sin ellas: "
+                       + "; ".join(fallidas))
+        if not delegs_zip:
+            st.info("No hay delegaciones para exportar.")
+        elif listas:
+            st.caption(f"{listas} listas en {_time.perf_counter() - t0:.1f} s"
+                       + (f" ({reutilizados} reutilizadas de la caché)." if reutilizados else "."))
+            st.download_button(
+                "⬇️ Descargar ZIP por delegación",
+                data=zbuf.getvalue(),
+                file_name=f"Listas_Asistencia_por_Delegacion_{date.today():%Y%m%d}.zip",
+                mime="application/zip",
+                use_container_width=True
+            )
+
 
 
 
@@ -0,0 +1,148 @@
+# =========================
+# ⏱️ Benchmark y prueba de carga de los almacenes (almacen_hojas.py)
+# Corre la misma secuencia de operaciones que hacen las apps (envíos por lote,
+# lectura incremental, edición, borrado, relectura completa) contra cada
+# backend local, y una prueba de carga concurrente contra la hoja falsa a
+# través del limitador de cuota de app-Esteban.py.
+#
+#   python benchmarks/bench_almacenes.py [filas]
+#   python benchmarks/bench_almacenes.py --carga HILOS LLAMADAS CUOTA_MIN
+# =========================
+import ast
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import gspread
+import pandas as pd
+import requests
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+import almacen_hojas  # noqa: E402
+
+APP = RAIZ / "app-Esteban.py"
+
+
+def cargar_app(nombres):
+    """Extrae definiciones del script de la app sin ejecutar Streamlit."""
+    tree = ast.parse(APP.read_text(encoding="utf-8"))
+    cuerpo = []
+    for n in tree.body:
+        if isinstance(n, (ast.FunctionDef, ast.ClassDef)) and n.name in nombres:
+            cuerpo.append(n)
+        elif isinstance(n, ast.Assign) and any(getattr(t, "id", None) in nombres for t in n.targets):
+            cuerpo.append(n)
+    ns = {"pd": pd, "gspread": gspread, "requests": requests, "almacen_hojas": almacen_hojas,
+          "threading": threading, "random": random, "_time": time, "deque": deque}
+    exec(compile(ast.Module(body=cuerpo, type_ignores=[]), str(APP), "exec"), ns)
+    return ns
+
+
+app = cargar_app({"HEADER", "ULTIMA_COL", "CUOTA_LECTURAS_MIN", "CUOTA_ESCRITURAS_MIN",
+                  "REINTENTOS_MAX", "BACKOFF_BASE", "BACKOFF_MAX", "BREAKER_FALLOS",
+                  "BREAKER_ENFRIAMIENTO", "LECTURAS", "NO_IDEMPOTENTES", "CircuitoAbierto",
+                  "_TokenBucket", "_es_reintentable", "_sin_efecto",
+                  "MUESTRAS_LATENCIA", "FASES_HTTP", "_MEDICION", "_percentil",
+                  "_ClienteSheets", "_ProxyLimitado"})
+HEADER = app["HEADER"]
+ULTIMA_COL = app["ULTIMA_COL"]
+
+
+def secuencia(ws, rondas=20):
+    """Lo que hace una sesión típica; devuelve segundos por operación."""
+    tiempos = {}
+
+    def medir(nombre, fn, *a, **k):
+        t0 = time.perf_counter()
+        res = fn(*a, **k)
+        tiempos.setdefault(nombre, []).append(time.perf_counter() - t0)
+        return res
+
+    for i in range(rondas):
+        n = len(medir("get_all_values", ws.get_all_values))
+        medir("append_rows (20)", ws.append_rows, almacen_hojas.filas_sinteticas(HEADER, 20, semilla=i),
+              value_input_option="USER_ENTERED")
+        medir("get (delta)", ws.get, f"A{n}:{ULTIMA_COL}")
+        filas = random.Random(i).sample(range(2, n + 1), min(10, n - 1))
+        medir("batch_update (10)", ws.batch_update,
+              [{"range": f"A{r}:H{r}", "values": [[f"editado {i}"] + [""] * 7]} for r in filas],
+              value_input_option="USER_ENTERED")
+        medir("deleteDimension (5)", ws.spreadsheet.batch_update, {"requests": [
+            {"deleteDimension": {"range": {"sheetId": ws.id, "dimension": "ROWS",
+                                           "startIndex": 1, "endIndex": 6}}}]})
+    return {k: statistics.median(v) for k, v in tiempos.items()}
+
+
+def comparar(filas: int):
+    carpeta = Path(tempfile.mkdtemp())
+    configs = {
+        "falso": dict(backend="falso"),
+        "falso (latencia Sheets)": dict(backend="falso", latencia=0.25),
+        "sqlite": dict(backend="sqlite"),
+    }
+    resultados = {}
+    for nombre, conf in configs.items():
+        conf = dict(conf)
+        backend = conf.pop("backend")
+        ws = almacen_hojas.abrir_hoja(backend, f"bench-{nombre}", "Hoja 1", HEADER, carpeta,
+                                      filas_iniciales=filas, **conf)
+        rondas = 5 if conf.get("latencia") else 20
+        resultados[nombre] = {k: v * 1000 for k, v in secuencia(ws, rondas).items()}
+    df = pd.DataFrame(resultados).round(2)
+    print(f"Mediana en ms por operación ({filas} filas iniciales)\n")
+    print(df.to_string())
+
+
+def carga(hilos: int, llamadas: int, cuota_min: int):
+    """Varios usuarios a la vez contra la hoja falsa, con el limitador de la app."""
+    app["CUOTA_LECTURAS_MIN"] = app["CUOTA_ESCRITURAS_MIN"] = cuota_min
+    cliente = app["_ClienteSheets"]()
+    hoja = almacen_hojas.abrir_hoja("falso", "carga", "Hoja 1", HEADER, Path(tempfile.mkdtemp()),
+                                    filas_iniciales=500, latencia=0.05, cuota_min=cuota_min,
+                                    prob_error=0.02)
+    ws = app["_ProxyLimitado"](hoja, cliente)
+    latencias, fallidas = [], []
+    lock = threading.Lock()
+
+    def usuario(u):
+        for i in range(llamadas):
+            t0 = time.perf_counter()
+            try:
+                if i % 3 == 0:
+                    ws.append_rows([[f"Usuario {u}", str(i)] + [""] * 6], value_input_option="USER_ENTERED")
+                else:
+                    ws.get(f"A490:{ULTIMA_COL}")
+            except Exception as e:
+                with lock:
+                    fallidas.append(type(e).__name__)
+                continue
+            with lock:
+                latencias.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    ts = [threading.Thread(target=usuario, args=(u,)) for u in range(hilos)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    total = time.perf_counter() - t0
+
+    q = statistics.quantiles(latencias, n=20) if len(latencias) > 1 else [0] * 19
+    print(f"{hilos} hilos × {llamadas} llamadas, cuota {cuota_min}/min: {total:.1f} s")
+    print(f"  ok {len(latencias)}  fallidas {len(fallidas)}  p50 {q[9] * 1000:.0f} ms  p95 {q[18] * 1000:.0f} ms")
+    print(f"  errores simulados en la hoja: {hoja.errores}")
+    print(cliente.resumen().to_string(index=False))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--carga"]:
+        args = [int(x) for x in sys.argv[2:5]]
+        carga(*(args + [8, 30, 600][len(args):]))
+    else:
+        comparar(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000)
@@ -0,0 +1,86 @@
+# =========================
+# ⏱️ Micro-benchmark: matriz de valores → DataFrame (fetch_all_df)
+# Compara la conversión anterior (dict por fila + reordenar columnas) con
+# _rows_to_df de app-Esteban.py.
+#
+#   python benchmarks/bench_rows_to_df.py [filas ...]
+# =========================
+import ast
+import random
+import sys
+import timeit
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+APP = Path(__file__).resolve().parent.parent / "app-Esteban.py"
+
+
+def cargar_app(nombres):
+    """Extrae definiciones del script de la app sin ejecutar Streamlit."""
+    tree = ast.parse(APP.read_text(encoding="utf-8"))
+    cuerpo = []
+    for n in tree.body:
+        if isinstance(n, ast.FunctionDef) and n.name in nombres:
+            cuerpo.append(n)
+        elif isinstance(n, ast.Assign) and any(getattr(t, "id", None) in nombres for t in n.targets):
+            cuerpo.append(n)
+    ns = {"pd": pd, "List": List}
+    exec(compile(ast.Module(body=cuerpo, type_ignores=[]), str(APP), "exec"), ns)
+    return ns
+
+
+app = cargar_app({"_rows_to_df", "NAME_MAP", "COLS_ORDER", "CAT_COLS", "HEADER"})
+HEADER, NAME_MAP, CAT_COLS = app["HEADER"], app["NAME_MAP"], app["CAT_COLS"]
+
+
+def anterior(values):
+    header = [h.strip().lower() for h in values[0]]
+    records = []
+    for idx, row in enumerate(values[1:], start=2):
+        rec = {}
+        for j, key in enumerate(header):
+            if key in NAME_MAP:
+                rec[NAME_MAP[key]] = row[j] if j < len(row) else ""
+        rec["rownum"] = idx
+        records.append(rec)
+    df = pd.DataFrame(records)
+    df = df[[c for c in app["COLS_ORDER"] if c in df.columns]]
+    df.insert(0, "Nº", range(1, len(df) + 1))
+    return df
+
+
+def nuevo(values, categoricos=False):
+    header = [h.strip().lower() for h in values[0]]
+    df = app["_rows_to_df"](header, values[1:], 2)
+    if categoricos:
+        df[CAT_COLS] = df[CAT_COLS].astype("category")
+    df.insert(0, "Nº", range(1, len(df) + 1))
+    return df
+
+
+def hoja_sintetica(n):
+    rnd = random.Random(0)
+    delegs = ["Carmen", "Pavas", "Hatillo", "Naranjo", "Grecia", "Liberia"]
+    values = [list(HEADER)]
+    for i in range(n):
+        fila = [f"Persona {i}", f"{rnd.randint(100000000, 799999999)}", rnd.choice(delegs),
+                "Oficial", f"8{rnd.randint(1000000, 9999999)}", rnd.choice(["F", "M", "LGBTIQ+"]),
+                rnd.choice(["H", "M", "I"]), rnd.choice(["18 a 35 años", "36 a 64 años", "65 años o más"])]
+        values.append(fila[:rnd.choice([6, 8, 8, 8])])  # la API recorta las celdas vacías al final
+    return values
+
+
+if __name__ == "__main__":
+    tamanos = [int(x) for x in sys.argv[1:]] or [1_000, 10_000, 50_000]
+    for n in tamanos:
+        values = hoja_sintetica(n)
+        a, b = anterior(values), nuevo(values, categoricos=True)
+        assert a.astype(str).equals(b.astype(str)), "las dos conversiones difieren"
+        reps = max(3, 20_000 // n)
+        t_a = min(timeit.repeat(lambda: anterior(values), number=1, repeat=reps))
+        t_b = min(timeit.repeat(lambda: nuevo(values), number=1, repeat=reps))
+        t_c = min(timeit.repeat(lambda: nuevo(values, categoricos=True), number=1, repeat=reps))
+        print(f"{n:>7} filas  anterior {t_a * 1000:8.1f} ms  nuevo {t_b * 1000:8.1f} ms  ×{t_a / t_b:5.1f}"
+              f"  (+categóricos {t_c * 1000:8.1f} ms)")
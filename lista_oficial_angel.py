@@ -0,0 +1,612 @@
+# =========================
+# 📄 Lista oficial de asistencia en Excel (app-Angel.py)
+# El armado vive fuera de la app para que la exportación por delegación lo
+# pueda correr en un pool de procesos: cada proceso importa este módulo y
+# guarda su propia plantilla y sus estilos en caché.
+# =========================
+import copy
+from datetime import date, time
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+
+NOTAS_ALTO = 14  # filas del recuadro de anotaciones y acuerdos
+EVIDENCIA_BASE = 13  # primera fila de la trazabilidad con la lista vacía
+FILAS_STREAMING = 400  # desde aquí la lista se escribe en modo streaming
+
+MESES_ES = [
+    "enero", "febrero", "marzo", "abril", "mayo", "junio",
+    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"
+]
+
+# Estilo de cada columna de una fila de datos (las demás llevan "marca")
+ESTILOS_FILA = {
+    "B": "numero",
+    "C": "dato", "F": "dato", "G": "dato", "H": "dato", "I": "dato", "J": "dato", "K": "dato",
+}
+
+
+@lru_cache(maxsize=None)
+def _estilos_oficiales() -> dict:
+    """Fuentes, rellenos, alineaciones y bordes de la lista oficial, creados una vez por proceso.
+
+    "bordes" tiene un Border por combinación de lados (arriba, abajo, izquierda,
+    derecha) y "nombrados" la definición de los estilos con nombre que cada libro
+    registra con _registrar_estilos. Los objetos son inmutables y se comparten.
+    """
+
+    from itertools import product
+    from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+    from openpyxl.styles.fonts import DEFAULT_FONT
+
+    thin = Side(style="thin", color="000000")
+
+    e = {
+        "celda_fill": PatternFill("solid", fgColor="D9D9D9"),
+        "banda_fill": PatternFill("solid", fgColor="1F3B73"),
+        "th_font": Font(bold=True),
+        "title_font": Font(bold=True, size=12),
+        "h1_font": Font(bold=True, size=14),
+        "center": Alignment(horizontal="center", vertical="center", wrap_text=True),
+        "left": Alignment(horizontal="left", vertical="top", wrap_text=True),
+        "right": Alignment(horizontal="right", vertical="center"),
+        "bordes": {
+            lados: Border(
+                top=thin if lados[0] else Side(),
+                bottom=thin if lados[1] else Side(),
+                left=thin if lados[2] else Side(),
+                right=thin if lados[3] else Side()
+            )
+            for lados in product((False, True), repeat=4)
+        },
+    }
+
+    e["border_all"] = e["bordes"][(True, True, True, True)]
+
+    e["nombrados"] = {
+        "encabezado": dict(font=e["th_font"], fill=e["celda_fill"], alignment=e["center"], border=e["border_all"]),
+        "recuadro": dict(font=e["title_font"], alignment=e["left"], border=e["border_all"]),
+        "dato": dict(font=DEFAULT_FONT, alignment=e["left"], border=e["border_all"]),
+        "numero": dict(font=DEFAULT_FONT, alignment=e["right"], border=e["border_all"]),
+        "marca": dict(font=DEFAULT_FONT, border=e["border_all"]),
+    }
+
+    return e
+
+
+def _registrar_estilos(wb) -> None:
+    """Registra en wb los estilos con nombre, siempre en el mismo orden."""
+
+    from openpyxl.styles import NamedStyle
+
+    for nombre, partes in _estilos_oficiales()["nombrados"].items():
+        wb.add_named_style(NamedStyle(name=nombre, **partes))
+
+
+# El esqueleto fijo de la lista (títulos, encabezados, logos, trazabilidad,
+# anotaciones y firmas) se arma una vez por posición del pie y queda en caché;
+# cada exportación clona la plantilla y solo escribe los campos variables y las filas.
+@lru_cache(maxsize=8)
+def _plantilla_oficial(evidencia_top: int):
+
+    from openpyxl import Workbook
+    from openpyxl.styles import Alignment
+    from openpyxl.utils import get_column_letter
+    from openpyxl.drawing.image import Image as XLImage
+
+    e = _estilos_oficiales()
+    celda_fill, th_font, h1_font, title_font = e["celda_fill"], e["th_font"], e["h1_font"], e["title_font"]
+    center, left, bordes = e["center"], e["left"], e["bordes"]
+
+    def outline_box(r1, c1, r2, c2):
+        # Cada celda del contorno toma una sola vez el borde compartido que le toca
+        contorno = {(r, c) for r in (r1, r2) for c in range(c1, c2 + 1)}
+        contorno |= {(r, c) for r in range(r1, r2 + 1) for c in (c1, c2)}
+
+        for r, c in contorno:
+            celda = ws.cell(row=r, column=c)
+            b = celda.border
+            celda.border = bordes[(
+                r == r1 or b.top.style is not None,
+                r == r2 or b.bottom.style is not None,
+                c == c1 or b.left.style is not None,
+                c == c2 or b.right.style is not None
+            )]
+
+    def box_all(r1, c1, r2, c2):
+        for r in range(r1, r2 + 1):
+            for c in range(c1, c2 + 1):
+                ws.cell(row=r, column=c).style = "marca"
+
+    wb = Workbook()
+    _registrar_estilos(wb)
+    ws = wb.active
+    ws.title = "Lista"
+    ws.sheet_view.showGridLines = False
+
+    ws.page_setup.orientation = ws.ORIENTATION_PORTRAIT
+    ws.page_setup.paperSize = ws.PAPERSIZE_A4
+    ws.page_setup.fitToWidth = 1
+    ws.page_setup.fitToHeight = 0
+    ws.page_margins.left = ws.page_margins.right = 0.3
+    ws.page_margins.top = ws.page_margins.bottom = 0.4
+
+    widths = {
+        "A": 2, "B": 6, "C": 26, "D": 22, "E": 22,
+        "F": 18, "G": 24, "H": 28, "I": 20,
+        "J": 16, "K": 14,
+        "L": 6, "M": 6, "N": 10,
+        "O": 6, "P": 6, "Q": 6,
+        "R": 14, "S": 14, "T": 14,
+        "U": 16
+    }
+
+    for col, w in widths.items():
+        ws.column_dimensions[col].width = w
+
+    ws.row_dimensions[1].height = 8
+    ws.row_dimensions[3].height = 50
+    ws.row_dimensions[4].height = 22
+    ws.row_dimensions[5].height = 18
+    ws.row_dimensions[6].height = 14
+
+    try:
+        if Path("logo_izq.png").exists():
+            img = XLImage("logo_izq.png")
+            target_h = 72
+            ratio = target_h / img.height
+            img.height = target_h
+            img.width = int(img.width * ratio)
+            ws.add_image(img, "D3")
+
+        if Path("logo_der.png").exists():
+            img2 = XLImage("logo_der.png")
+            target_h2 = 72
+            ratio2 = target_h2 / img2.height
+            img2.height = target_h2
+            img2.width = int(img2.width * ratio2)
+            ws.add_image(img2, "Q3")
+    except Exception:
+        pass
+
+    ws.merge_cells("B3:U3")
+    ws["B3"].value = "Modelo de Gestión Policial de Fuerza Pública"
+    ws["B3"].alignment = center
+    ws["B3"].font = h1_font
+
+    ws.merge_cells("B4:U4")
+    ws["B4"].value = "Lista de Asistencia & Minuta"
+    ws["B4"].alignment = center
+    ws["B4"].font = h1_font
+
+    ws.merge_cells("B5:U5")
+    ws["B5"].value = "Consecutivo:"
+    ws["B5"].alignment = center
+    ws["B5"].font = title_font
+
+    ws.merge_cells("B6:U6")
+    ws["B6"].fill = e["banda_fill"]
+    outline_box(1, 2, 6, 21)
+
+    ws.merge_cells(start_row=7, start_column=2, end_row=7, end_column=4)
+    ws.merge_cells(start_row=7, start_column=5, end_row=7, end_column=9)
+    ws.merge_cells(start_row=7, start_column=10, end_row=7, end_column=16)
+    ws.merge_cells(start_row=7, start_column=17, end_row=7, end_column=21)
+
+    box_all(7, 2, 7, 4)
+    box_all(7, 5, 7, 9)
+    box_all(7, 10, 7, 16)
+    box_all(7, 17, 7, 21)
+
+    ws["B7"].style = "recuadro"
+    ws["E7"].style = "recuadro"
+
+    ws["J7"].alignment = center
+
+    ws["Q7"].alignment = center
+
+    ws.merge_cells(start_row=8, start_column=2, end_row=8, end_column=3)
+    ws.merge_cells(start_row=8, start_column=4, end_row=8, end_column=9)
+
+    box_all(8, 2, 8, 3)
+    box_all(8, 4, 8, 9)
+
+    ws["B8"].value = "Estrategia o Programa:"
+    ws["B8"].style = "dato"
+
+    ws["D8"].style = "dato"
+
+    ws.merge_cells(start_row=8, start_column=10, end_row=9, end_column=21)
+    ws["J8"].value = (
+        "ACTIVIDAD: Reunión Virtual de Seguimiento de líneas de acción, "
+        "acciones estratégicas, indicadores y metas."
+    )
+    ws["J8"].alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
+    outline_box(8, 10, 9, 21)
+
+    ws.merge_cells(start_row=9, start_column=2, end_row=9, end_column=3)
+    ws.merge_cells(start_row=9, start_column=4, end_row=9, end_column=9)
+
+    box_all(9, 2, 9, 3)
+    box_all(9, 4, 9, 9)
+
+    ws["B9"].value = "Dirección / Delegación Policial:"
+    ws["B9"].style = "dato"
+
+    ws["D9"].style = "dato"
+
+    # Encabezado tabla
+    ws["B10"].value = ""
+    ws.merge_cells("C10:E11")
+    ws["C10"].value = "Nombre"
+
+    ws["F10"].value = "Cédula de Identidad"
+    ws["G10"].value = "Delegación"
+    ws["H10"].value = "Cargo"
+    ws["I10"].value = "Teléfono"
+    ws["J10"].value = "Fecha Registro"
+    ws["K10"].value = "Hora Registro"
+
+    ws.merge_cells("L10:N10")
+    ws["L10"].value = "Género"
+
+    ws.merge_cells("O10:Q10")
+    ws["O10"].value = "Sexo (Hombre, Mujer o Intersex)"
+
+    ws.merge_cells("R10:T10")
+    ws["R10"].value = "Rango de Edad"
+
+    ws["U10"].value = "FIRMA"
+
+    ws["L11"], ws["M11"], ws["N11"] = "F", "M", "LGBTIQ+"
+    ws["O11"], ws["P11"], ws["Q11"] = "H", "M", "I"
+    ws["R11"], ws["S11"], ws["T11"] = "18 a 35 años", "36 a 64 años", "65 años o más"
+
+    box_all(10, 2, 11, 21)
+
+    for cell in [
+        "C10", "L10", "O10", "R10",
+        "F10", "G10", "H10", "I10", "J10", "K10", "U10",
+        "L11", "M11", "N11", "O11", "P11", "Q11", "R11", "S11", "T11"
+    ]:
+        ws[cell].style = "encabezado"
+
+    ws.freeze_panes = "A12"
+
+
+    ws.merge_cells(start_row=evidencia_top, start_column=2, end_row=evidencia_top, end_column=21)
+    box_all(evidencia_top, 2, evidencia_top, 21)
+    ws[f"B{evidencia_top}"].value = "Trazabilidad del registro electrónico de asistencia"
+    ws[f"B{evidencia_top}"].style = "encabezado"
+
+    evidencia_text_row = evidencia_top + 1
+    ws.merge_cells(start_row=evidencia_text_row, start_column=2, end_row=evidencia_text_row + 2, end_column=21)
+    ws[f"B{evidencia_text_row}"].value = (
+        "Los registros de asistencia fueron capturados mediante formulario electrónico. "
+        "El Excel oficial incorpora la fecha y hora reportada por el dispositivo utilizado para cada registro. "
+        "En caso de no poder detectar dicha información, se utiliza la fecha y hora del servidor como respaldo técnico. "
+        "Adicionalmente, la base de datos conserva la fecha y hora del servidor como mecanismo complementario de trazabilidad y control."
+    )
+    ws[f"B{evidencia_text_row}"].alignment = left
+    outline_box(evidencia_text_row, 2, evidencia_text_row + 2, 21)
+
+    notes_top = evidencia_text_row + 5
+    notes_height = NOTAS_ALTO
+
+    ws.merge_cells(start_row=notes_top, start_column=2, end_row=notes_top, end_column=11)
+    ws.merge_cells(start_row=notes_top, start_column=13, end_row=notes_top, end_column=21)
+
+    ws[f"B{notes_top}"].value = "Anotaciones Generales."
+    ws[f"M{notes_top}"].value = "Acuerdos."
+
+    ws[f"B{notes_top}"].alignment = center
+    ws[f"M{notes_top}"].alignment = center
+
+    ws[f"B{notes_top}"].font = th_font
+    ws[f"M{notes_top}"].font = th_font
+
+    ws[f"B{notes_top}"].fill = celda_fill
+    ws[f"M{notes_top}"].fill = celda_fill
+
+    outline_box(notes_top + 1, 2, notes_top + notes_height, 11)
+    outline_box(notes_top + 1, 13, notes_top + notes_height, 21)
+
+    ws.merge_cells(start_row=notes_top + 1, start_column=2, end_row=notes_top + notes_height, end_column=11)
+    ws[f"B{notes_top + 1}"].alignment = left
+
+    ws.merge_cells(start_row=notes_top + 1, start_column=13, end_row=notes_top + notes_height, end_column=21)
+    ws[f"M{notes_top + 1}"].alignment = left
+
+    row_pie = notes_top + notes_height + 2
+
+    ws.merge_cells(start_row=row_pie, start_column=2, end_row=row_pie, end_column=11)
+    ws[f"B{row_pie}"].alignment = left
+
+    row_firma = row_pie + 3
+    sig_c1, sig_c2 = 4, 11
+
+    ws.merge_cells(start_row=row_firma, start_column=sig_c1, end_row=row_firma, end_column=sig_c2)
+
+    for c in range(sig_c1, sig_c2 + 1):
+        ws.cell(row=row_firma, column=c).border = bordes[(False, True, False, False)]
+
+    col = get_column_letter(sig_c1)
+    ws.row_dimensions[row_firma].height = 24
+
+    ws[f"{col}{row_firma}"].alignment = Alignment(horizontal="center", vertical="bottom")
+
+    ws.merge_cells(start_row=row_firma + 1, start_column=sig_c1, end_row=row_firma + 1, end_column=sig_c2)
+    ws[f"{col}{row_firma + 1}"].value = "Nombre"
+    ws[f"{col}{row_firma + 1}"].alignment = Alignment(horizontal="center")
+
+    ws.merge_cells(start_row=row_firma + 3, start_column=2, end_row=row_firma + 3, end_column=11)
+    ws[f"B{row_firma + 3}"].value = "Cargo:"
+    ws[f"B{row_firma + 3}"].alignment = left
+
+    ws.merge_cells(start_row=row_firma + 5, start_column=13, end_row=row_firma + 5, end_column=21)
+    ws[f"M{row_firma + 5}"].value = "Sello Policial"
+    ws[f"M{row_firma + 5}"].alignment = Alignment(horizontal="right", vertical="center")
+
+    ws.protection.sheet = True
+    ws.protection.selectLockedCells = True
+    ws.protection.selectUnlockedCells = True
+
+    return wb
+
+
+def _clonar_libro(plantilla):
+    """Copia independiente del libro plantilla para una exportación."""
+
+    from openpyxl.utils.indexed_list import IndexedList
+
+    wb = copy.deepcopy(plantilla)
+
+    # deepcopy deja vacías las IndexedList (estilos y cadenas compartidas) porque
+    # restaura su índice antes que los elementos; se rehacen desde la plantilla.
+    for nombre, valor in vars(plantilla).items():
+        if isinstance(valor, IndexedList):
+            setattr(wb, nombre, IndexedList(valor))
+
+    return wb
+
+
+def _valores_fila(i: int, row: dict) -> dict:
+    """Valores de la fila i de la lista oficial, por letra de columna."""
+
+    valores = {
+        "B": i + 1,
+        "C": str(row.get("Nombre", "")),
+        "F": str(row.get("Cédula de Identidad", "")),
+        "G": str(row.get("Delegación", "")),
+        "H": str(row.get("Cargo", "")),
+        "I": str(row.get("Teléfono", "")),
+        "J": str(row.get("Fecha Dispositivo", "")),
+        "K": str(row.get("Hora Dispositivo", "")),
+        "U": "Virtual",
+    }
+
+    g = (row.get("Género", "") or "").strip()
+    if g == "F":
+        valores["L"] = "X"
+    elif g == "M":
+        valores["M"] = "X"
+    elif g == "LGBTIQ+":
+        valores["N"] = "X"
+
+    s = (row.get("Sexo", "") or "").strip()
+    if s == "H":
+        valores["O"] = "X"
+    elif s == "M":
+        valores["P"] = "X"
+    elif s == "I":
+        valores["Q"] = "X"
+
+    e = (row.get("Rango de Edad", "") or "").strip()
+    if e.startswith("18"):
+        valores["R"] = "X"
+    elif e.startswith("36"):
+        valores["S"] = "X"
+    elif e.startswith("65"):
+        valores["T"] = "X"
+
+    return valores
+
+
+def _excel_oficial_streaming(campos: dict, rows_df: pd.DataFrame) -> bytes:
+    """Lista oficial en modo write-only para listas grandes.
+
+    Usa la plantilla de EVIDENCIA_BASE (campos van en sus coordenadas): copia
+    sus filas fijas, emite las filas de datos a medida que se recorren y
+    desplaza la trazabilidad y el pie hasta después de la última. La hoja se
+    escribe fila a fila, sin guardar las celdas en memoria.
+    """
+
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+    from openpyxl.utils.indexed_list import IndexedList
+    from openpyxl.worksheet.cell_range import CellRange
+    from openpyxl.worksheet.page import PrintPageSetup
+
+    start_row = 12
+    evidencia_top = start_row + len(rows_df) + 1
+    desplazamiento = evidencia_top - EVIDENCIA_BASE
+
+    plantilla = _plantilla_oficial(EVIDENCIA_BASE)
+    tpl = plantilla.active
+
+    # Mismas tablas de estilos que la plantilla: los _style de sus celdas valen tal cual
+    wb = Workbook(write_only=True)
+
+    for nombre, valor in vars(plantilla).items():
+        if isinstance(valor, IndexedList):
+            setattr(wb, nombre, IndexedList(valor))
+
+    _registrar_estilos(wb)
+    ws = wb.create_sheet(tpl.title)
+
+    # Propiedades de hoja: deben quedar listas antes de la primera fila
+    ws.views = copy.deepcopy(tpl.views)
+    ws.sheet_properties = copy.deepcopy(tpl.sheet_properties)
+    ws.page_setup = PrintPageSetup(worksheet=ws, **dict(tpl.page_setup))
+    ws.page_margins = copy.copy(tpl.page_margins)
+    ws.protection = copy.copy(tpl.protection)
+
+    for col, dim in tpl.column_dimensions.items():
+        ws.column_dimensions[col].width = dim.width
+
+    for r, dim in tpl.row_dimensions.items():
+        if dim.height is not None:
+            ws.row_dimensions[r + desplazamiento if r >= EVIDENCIA_BASE else r].height = dim.height
+
+    for img in tpl._images:
+        ws.add_image(copy.copy(img))
+
+    for rango in tpl.merged_cells.ranges:
+        d = desplazamiento if rango.min_row >= EVIDENCIA_BASE else 0
+
+        # Directo al conjunto: MultiCellRange.add revisa todos los rangos previos
+        ws.merged_cells.ranges.add(CellRange(
+            min_col=rango.min_col,
+            min_row=rango.min_row + d,
+            max_col=rango.max_col,
+            max_row=rango.max_row + d
+        ))
+
+    filas_tpl = {}
+
+    for (r, c), celda in tpl._cells.items():
+        filas_tpl.setdefault(r, []).append((c, celda))
+
+    def fila_plantilla(r):
+        fila = []
+
+        for c, celda in sorted(filas_tpl.get(r, [])):
+            while len(fila) < c - 1:
+                fila.append(None)
+
+            nueva = WriteOnlyCell(ws, campos.get(celda.coordinate, celda.value))
+            nueva._style = copy.copy(celda._style)
+            fila.append(nueva)
+
+        return fila
+
+    for r in range(1, start_row):
+        ws.append(fila_plantilla(r))
+
+    # Filas de datos con los estilos con nombre de cada columna
+    letras = [get_column_letter(c) for c in range(2, 22)]
+    estilos = {col: wb._named_styles[ESTILOS_FILA.get(col, "marca")].as_tuple() for col in letras}
+
+    columnas = list(rows_df.columns)
+
+    for i, tupla in enumerate(rows_df.itertuples(index=False, name=None)):
+        r = start_row + i
+        valores = _valores_fila(i, dict(zip(columnas, tupla)))
+
+        fila = [None]
+
+        for col in letras:
+            nueva = WriteOnlyCell(ws, valores.get(col))
+            nueva._style = copy.copy(estilos[col])
+            fila.append(nueva)
+
+        ws.append(fila)
+        ws.merged_cells.ranges.add(CellRange(min_col=3, min_row=r, max_col=5, max_row=r))
+
+    for r in range(start_row + len(rows_df), evidencia_top):
+        ws.append([])
+
+    for r in range(EVIDENCIA_BASE, max(filas_tpl) + 1):
+        ws.append(fila_plantilla(r))
+
+    bio = BytesIO()
+    wb.save(bio)
+    return bio.getvalue()
+
+
+def precalentar() -> None:
+    """Deja en caché los estilos y la plantilla más usada (al arrancar un proceso del pool)."""
+
+    _plantilla_oficial(EVIDENCIA_BASE)
+
+
+def build_excel_oficial_single(
+    fecha: date,
+    lugar: str,
+    hora_ini: time,
+    hora_fin: time,
+    estrategia: str,
+    delegacion_hdr: str,
+    rows_df: pd.DataFrame,
+    anotaciones_txt: str,
+    acuerdos_txt: str,
+    firmante: str
+) -> bytes:
+    """Lista oficial (.xlsx) con el encabezado dado y una fila por registro de rows_df."""
+
+    from openpyxl.utils import get_column_letter
+
+    mes_es = MESES_ES[fecha.month - 1]
+
+    def campos(evidencia_top: int) -> dict:
+        """Campos variables de la plantilla cuya trazabilidad empieza en evidencia_top."""
+
+        notes_top = evidencia_top + 6
+        row_pie = notes_top + NOTAS_ALTO + 2
+
+        valores = {
+            "B7": f"Fecha: {fecha.day} {mes_es} {fecha.year}",
+            "E7": f"Lugar: {lugar}" if lugar else "Lugar:",
+            "J7": f"Hora Inicio: {hora_ini.strftime('%H:%M')}",
+            "Q7": f"Hora Finalización: {hora_fin.strftime('%H:%M')}",
+            "D8": estrategia,
+            "D9": delegacion_hdr,
+            f"B{row_pie}": f"Se Finaliza la Reunión a:   {hora_fin.strftime('%H:%M')}",
+            f"D{row_pie + 3}": (firmante or "").strip(),
+        }
+
+        if anotaciones_txt.strip():
+            valores[f"B{notes_top + 1}"] = anotaciones_txt.strip()
+
+        if acuerdos_txt.strip():
+            valores[f"M{notes_top + 1}"] = acuerdos_txt.strip()
+
+        return valores
+
+    if len(rows_df) > FILAS_STREAMING:
+        return _excel_oficial_streaming(campos(EVIDENCIA_BASE), rows_df)
+
+    start_row = 12
+    last_data_row = start_row + len(rows_df) - 1 if len(rows_df) > 0 else 11
+    evidencia_top = last_data_row + 2
+
+    wb = _clonar_libro(_plantilla_oficial(evidencia_top))
+    ws = wb.active
+
+    # Campos variables (el formato ya viene de la plantilla)
+    for coord, valor in campos(evidencia_top).items():
+        ws[coord].value = valor
+
+    # Filas: cada celda toma por referencia el estilo con nombre de su columna
+    estilos = [
+        wb._named_styles[ESTILOS_FILA.get(get_column_letter(c), "marca")].as_tuple()
+        for c in range(2, 22)
+    ]
+
+    for i, row in enumerate(rows_df.to_dict("records")):
+        r = start_row + i
+
+        ws.merge_cells(start_row=r, start_column=3, end_row=r, end_column=5)
+
+        for c, estilo in zip(range(2, 22), estilos):
+            ws.cell(row=r, column=c)._style = copy.copy(estilo)
+
+        for col, valor in _valores_fila(i, row).items():
+            ws[f"{col}{r}"].value = valor
+
+    bio = BytesIO()
+    wb.save(bio)
+    return bio.getvalue()